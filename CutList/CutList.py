@@ -4,15 +4,81 @@ import traceback
 import adsk.core
 import adsk.fusion
 import csv
+import json
 import os
+import time
 from datetime import datetime
 from collections import defaultdict
 # import adsk.cam
+from . import cutting_stock
+from . import sheet_nesting
+from . import grouping
+from . import writers
+
+# numpy is optional, it is only needed for the principal axes fallback of the oriented sizing mode
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Initialize the global variables for the Application and UserInterface objects.
 app = adsk.core.Application.get()
 ui  = app.userInterface
 
+# Persist measured body dimensions between runs so only new or changed bodies are measured again.
+# Only used in the 'oriented' sizing mode, an aligned measurement is cheaper than checking the cache.
+USE_DIMENSION_CACHE = True
+CACHE_FILENAME = 'cut_list_cache.json'
+
+# How bodies are sized: 'aligned' uses the world axis-aligned bounding box,
+# 'oriented' uses the smallest box around the body so rotated parts measure correctly
+SIZING_MODE = 'oriented'
+# Bodies whose volume fills this much of their axis-aligned box are treated as already aligned
+ALIGNED_FILL_RATIO = 0.999
+# Cap on mesh vertices used to fit the principal axes, the extents always use every vertex
+MAX_SAMPLE_POINTS = 5000
+
+# Lay the cut lengths out on stock bars and write a cutting plan next to the cut list
+OPTIMIZE_STOCK = True
+STOCK_LENGTHS = [96.0, 120.0, 144.0]  # inches
+KERF = 0.125  # inches
+# Seconds spent in total, shared by all cross-sections, improving on the first-fit-decreasing layout
+OPTIMIZER_TIME_BUDGET = 2.0
+
+# Cuts whose dimensions all agree within this many inches are listed as one row, 0 groups exact matches only
+GROUPING_TOLERANCE = 1 / 64
+
+# Cut list output formats, any of 'csv', 'xlsx' (needs openpyxl) and 'jsonl'
+OUTPUT_FORMATS = ['csv']
+# Columns the cut list rows are grouped by and then sorted by, leave empty to keep the order parts were found in
+GROUP_KEYS = []
+SORT_KEYS = []
+SORT_DESCENDING = False
+
+# Create cut lists for many designs in one run instead of just the active design
+BATCH_MODE = False
+# Ids of the data files to process in batch mode, leave empty to process every design in the active project
+BATCH_DATA_FILE_IDS = []
+BATCH_FOLDER_NAME = 'cut_list_batch'
+BATCH_CHECKPOINT_FILENAME = 'checkpoint.json'
+
+# Multiply each component's bodies by the number of times the component is placed in the assembly
+OCCURRENCE_AWARE = True
+
+# Nest panel parts (plywood, luan) onto sheets and write a layout CSV plus one DXF per sheet.
+# Off by default: thin wide boards such as 1x8 or 1x12 look like panels too, so only turn it on
+# for designs whose thin wide parts really are cut from sheets.
+NEST_PANELS = False
+SHEET_LENGTH = 96.0  # inches
+SHEET_WIDTH = 48.0  # inches
+# Parts no thicker than this and at least this wide are treated as panels, as long as they fit on a sheet
+PANEL_MAX_THICKNESS = 1.0  # inches
+PANEL_MIN_WIDTH = 6.0  # inches
+# 'maxrects' packs tighter, 'guillotine' only produces layouts that can be cut with straight through cuts
+NESTING_HEURISTIC = 'maxrects'
+# Keep the grain running along the sheet length by never rotating parts
+GRAIN_LOCKED = True
+
 def mm_to_inches(mm_value):
     """Convert millimeters to inches and round to 4 decimal places."""
     return round(mm_value / 2.54, 4)
@@ -33,71 +99,621 @@ def get_body_dimensions(body):
     
     return dimensions
 
+def is_axis_aligned(body):
+    """Quickly check if a body is already square to the world axes."""
+    bbox = body.boundingBox
+    box_volume = ((bbox.maxPoint.x - bbox.minPoint.x) *
+                  (bbox.maxPoint.y - bbox.minPoint.y) *
+                  (bbox.maxPoint.z - bbox.minPoint.z))
+    if box_volume <= 0:
+        return True
+
+    # A rectangular part that is square to the axes fills its bounding box
+    if body.volume / box_volume >= ALIGNED_FILL_RATIO:
+        return True
+
+    # Otherwise every planar face of an aligned part points along an axis
+    found_plane = False
+    for face in body.faces:
+        plane = adsk.core.Plane.cast(face.geometry)
+        if not plane:
+            continue
+        found_plane = True
+        normal = plane.normal
+        components = sorted([abs(normal.x), abs(normal.y), abs(normal.z)])
+        if components[0] > 1e-6 or components[1] > 1e-6:
+            return False
+    return found_plane
+
+def get_principal_axes_extents(body):
+    """Fit a box along the principal axes of the body's mesh and return its extents, or None."""
+    if np is None:
+        return None
+
+    calculator = body.meshManager.createMeshCalculator()
+    calculator.setQuality(adsk.fusion.TriangleMeshQualityOptions.LowQualityTriangleMesh)
+    mesh = calculator.calculate()
+    points = np.array(mesh.nodeCoordinatesAsDouble, dtype=float).reshape(-1, 3)
+    if len(points) < 4:
+        return None
+
+    # Fit the axes on an even sample of large meshes, but measure every vertex so the
+    # extremes the sample skipped still count
+    sample = points
+    if len(points) > MAX_SAMPLE_POINTS:
+        sample = points[::len(points) // MAX_SAMPLE_POINTS + 1]
+
+    _, axes = np.linalg.eigh(np.cov((sample - sample.mean(axis=0)).T))
+    projected = points @ axes
+    extents = projected.max(axis=0) - projected.min(axis=0)
+    return extents.tolist()
+
+def get_oriented_body_dimensions(body):
+    """Calculate the dimensions of a body along its own orientation and return them sorted by length."""
+    # Skip the expensive work for parts that are already square to the axes
+    if is_axis_aligned(body):
+        return get_body_dimensions(body)
+
+    # Newer versions of the API can compute the minimum oriented box directly
+    oriented_box = getattr(body, 'orientedMinimumBoundingBox', None)
+    if oriented_box:
+        extents = [oriented_box.length, oriented_box.width, oriented_box.height]
+    else:
+        extents = get_principal_axes_extents(body)
+        if not extents:
+            return get_body_dimensions(body)
+
+    dimensions = [mm_to_inches(extent) for extent in extents]
+    dimensions.sort(reverse=True)
+
+    # Never report a box larger than the axis-aligned one
+    aligned = get_body_dimensions(body)
+    if dimensions[0] * dimensions[1] * dimensions[2] > aligned[0] * aligned[1] * aligned[2]:
+        return aligned
+    return dimensions
+
+def measure_body(body):
+    """Return the dimensions of a body using the configured sizing mode."""
+    if SIZING_MODE == 'oriented':
+        return get_oriented_body_dimensions(body)
+    return get_body_dimensions(body)
+
+def get_design_cache_key(design):
+    """Return a key identifying the design in the cache file."""
+    document = design.parentDocument
+    data_file = document.dataFile if document else None
+    if data_file:
+        return data_file.id
+    # Unsaved designs have no data file, fall back to the document name
+    return document.name if document else 'untitled'
+
+def get_design_version(design):
+    """Return the saved version number of the design, or 0 if it has never been saved."""
+    document = design.parentDocument
+    data_file = document.dataFile if document else None
+    return data_file.versionNumber if data_file else 0
+
+def load_dimension_cache(cache_path, design_key):
+    """Load the cached body dimensions for a design from the sidecar file."""
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r') as cache_file:
+            all_designs = json.load(cache_file)
+    except (OSError, ValueError):
+        # A corrupt or unreadable cache only costs us a full re-measure
+        return {}
+    return all_designs.get(design_key, {}).get('bodies', {})
+
+def save_dimension_cache(cache_path, design_key, design_version, bodies):
+    """Write the body dimensions for a design back to the sidecar file."""
+    all_designs = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as cache_file:
+                all_designs = json.load(cache_file)
+        except (OSError, ValueError):
+            all_designs = {}
+
+    all_designs[design_key] = {'version': design_version, 'bodies': bodies}
+
+    # Write to a temp file first so an interrupted run can't leave a half written cache
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'w') as cache_file:
+        json.dump(all_designs, cache_file)
+    os.replace(temp_path, cache_path)
+
+def resolve_cached_bodies(design, cache):
+    """Re-key cache entries by the current token of the body they were saved for.
+
+    Tokens of the same body can differ between sessions, so saved tokens are resolved with
+    findEntityByToken instead of being compared as strings.
+    """
+    resolved = {}
+    for token, entry in cache.items():
+        try:
+            entities = design.findEntityByToken(token)
+        except RuntimeError:
+            continue
+        for entity in entities:
+            body = adsk.fusion.BRepBody.cast(entity)
+            if body:
+                resolved[body.entityToken] = entry
+    return resolved
+
+def get_body_fingerprint(body):
+    """Return a cheap geometry fingerprint used to detect changed bodies."""
+    bbox = body.boundingBox
+    return [
+        SIZING_MODE,
+        round(body.volume, 6),
+        body.faces.count,
+        round(bbox.minPoint.x, 6), round(bbox.minPoint.y, 6), round(bbox.minPoint.z, 6),
+        round(bbox.maxPoint.x, 6), round(bbox.maxPoint.y, 6), round(bbox.maxPoint.z, 6)
+    ]
+
+def get_cached_body_dimensions(body, cache, design_version, seen_tokens):
+    """Return the dimensions of a body, measuring it only if it is new or has changed.
+
+    Returns a tuple of (dimensions, was_measured).
+    """
+    token = body.entityToken
+    seen_tokens.add(token)
+    fingerprint = get_body_fingerprint(body)
+
+    entry = cache.get(token)
+    if entry and entry['fingerprint'] == fingerprint:
+        entry['version'] = design_version
+        return entry['dimensions'], False
+
+    dimensions = measure_body(body)
+    cache[token] = {
+        'fingerprint': fingerprint,
+        'dimensions': dimensions,
+        'version': design_version
+    }
+    return dimensions, True
+
+def group_within_tolerance(cut_counts, cut_details, tolerance):
+    """Merge cuts whose dimensions agree within tolerance and return the new counts and details."""
+    mapping = grouping.group_cuts(cut_counts, tolerance)
+
+    grouped_counts = defaultdict(int)
+    grouped_details = {}
+    # Walk the cuts in sorted order so the body named for each group doesn't depend on traversal order
+    for cut_key in sorted(cut_counts):
+        group_key = mapping[cut_key]
+        grouped_counts[group_key] += cut_counts[cut_key]
+        if group_key not in grouped_details:
+            width, height, length = group_key
+            details = cut_details[cut_key].copy()
+            details['Material Width'] = width
+            details['Material Height'] = height
+            details['Length to Cut'] = length
+            grouped_details[group_key] = details
+    return grouped_counts, grouped_details
+
+def get_component_instance_counts(design):
+    """Return how many times each component appears in the assembly, keyed by component id.
+
+    Each unique component's child occurrences are read once and the counts are pushed down
+    the assembly tree, so the work grows with the number of unique components rather than
+    the number of instances.
+    """
+    root = design.rootComponent
+
+    # Direct child components of each component and how often each is placed
+    children = {}
+    for component in design.allComponents:
+        placed = defaultdict(int)
+        for occurrence in component.occurrences:
+            placed[occurrence.component.id] += 1
+        children[component.id] = placed
+
+    # Order the components so every parent comes before its children
+    order = []
+    visited = set()
+    stack = [(root.id, False)]
+    while stack:
+        component_id, expanded = stack.pop()
+        if expanded:
+            order.append(component_id)
+            continue
+        if component_id in visited:
+            continue
+        visited.add(component_id)
+        stack.append((component_id, True))
+        for child_id in children.get(component_id, {}):
+            if child_id not in visited:
+                stack.append((child_id, False))
+    order.reverse()
+
+    counts = defaultdict(int)
+    counts[root.id] = 1
+    for component_id in order:
+        for child_id, placed in children.get(component_id, {}).items():
+            counts[child_id] += counts[component_id] * placed
+    return counts
+
+def write_cutting_plan(filepath, cut_counts):
+    """Assign the cut lengths of each cross-section to stock bars and write the plan to a CSV."""
+    # Collect the demand for each (width, height) section
+    sections = defaultdict(dict)
+    for (width, height, length), count in cut_counts.items():
+        # Panels are nested on sheets instead
+        if NEST_PANELS and is_panel(width, height, length):
+            continue
+        sections[(width, height)][length] = sections[(width, height)].get(length, 0) + count
+
+    with open(filepath, 'w', newline='') as csvfile:
+        fieldnames = ['Material Width', 'Material Height', 'Bars', 'Stock Length', 'Cuts', 'Waste Per Bar']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+
+        deadline = time.perf_counter() + OPTIMIZER_TIME_BUDGET
+        ordered = sorted(sections.items())
+        for index, ((width, height), demand) in enumerate(ordered):
+            # Split what is left of the budget evenly over the sections still to do
+            budget = max(0.0, deadline - time.perf_counter()) / (len(ordered) - index)
+            bars, oversize = cutting_stock.optimize_cuts(demand, STOCK_LENGTHS, KERF, budget)
+            for qty, bar in cutting_stock.group_bars(bars):
+                writer.writerow({
+                    'Material Width': width,
+                    'Material Height': height,
+                    'Bars': qty,
+                    'Stock Length': bar['stock_length'],
+                    'Cuts': ' + '.join(str(cut) for cut in bar['cuts']),
+                    'Waste Per Bar': bar['waste']
+                })
+            # Parts longer than any stock still need to show up so they aren't forgotten
+            for length, qty in sorted(oversize.items(), reverse=True):
+                writer.writerow({
+                    'Material Width': width,
+                    'Material Height': height,
+                    'Bars': qty,
+                    'Stock Length': 'Longer than stock',
+                    'Cuts': str(length),
+                    'Waste Per Bar': ''
+                })
+
+def is_panel(width, height, length):
+    """Return True if a cut should be nested on sheets rather than cut from bars.
+
+    Thin wide parts longer or wider than a sheet stay in the bar cutting plan so they aren't lost.
+    """
+    if height > PANEL_MAX_THICKNESS or width < PANEL_MIN_WIDTH:
+        return False
+    fits = length <= SHEET_LENGTH and width <= SHEET_WIDTH
+    fits_rotated = not GRAIN_LOCKED and length <= SHEET_WIDTH and width <= SHEET_LENGTH
+    return fits or fits_rotated
+
+def write_sheet_layouts(filepath, dxf_dir, cut_counts, cut_details):
+    """Nest the panel parts on sheets grouped by thickness and write the layouts.
+
+    Returns the number of sheets used.
+    """
+    # Collect the panel parts for each thickness, one entry per part to cut
+    thicknesses = defaultdict(list)
+    for cut_key, count in cut_counts.items():
+        width, height, length = cut_key
+        if not is_panel(width, height, length):
+            continue
+        name = cut_details[cut_key]['Body Name']
+        for _ in range(count):
+            thicknesses[height].append({'name': name, 'length': length, 'width': width})
+
+    if not thicknesses:
+        return 0
+
+    os.makedirs(dxf_dir, exist_ok=True)
+    sheet_count = 0
+    with open(filepath, 'w', newline='') as csvfile:
+        fieldnames = ['Thickness', 'Sheet', 'Body Name', 'X', 'Y', 'Length', 'Width', 'Rotated']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+
+        for thickness, parts in sorted(thicknesses.items()):
+            sheets, unplaced = sheet_nesting.nest_parts(parts, SHEET_LENGTH, SHEET_WIDTH, KERF,
+                                                        NESTING_HEURISTIC, GRAIN_LOCKED)
+            for index, placements in enumerate(sheets, start=1):
+                for placement in placements:
+                    writer.writerow({
+                        'Thickness': thickness,
+                        'Sheet': index,
+                        'Body Name': placement['name'],
+                        'X': placement['x'],
+                        'Y': placement['y'],
+                        'Length': placement['length'],
+                        'Width': placement['width'],
+                        'Rotated': placement['rotated']
+                    })
+                dxf_name = f'sheet_{thickness}_{index}.dxf'
+                sheet_nesting.write_sheet_dxf(os.path.join(dxf_dir, dxf_name), placements, SHEET_LENGTH, SHEET_WIDTH)
+            # Parts bigger than a sheet still need to show up so they aren't forgotten
+            for part in unplaced:
+                writer.writerow({
+                    'Thickness': thickness,
+                    'Sheet': 'Larger than sheet',
+                    'Body Name': part['name'],
+                    'Length': part['length'],
+                    'Width': part['width']
+                })
+            sheet_count += len(sheets)
+
+    return sheet_count
+
+def collect_cuts(design, script_dir):
+    """Measure every body in a design and return the cut counts and details keyed by (width, height, length)."""
+    # Get all components in the design
+    components = design.allComponents
+
+    # Load the dimensions measured on previous runs
+    cache_path = os.path.join(script_dir, CACHE_FILENAME)
+    design_key = get_design_cache_key(design)
+    design_version = get_design_version(design)
+    use_cache = USE_DIMENSION_CACHE and SIZING_MODE == 'oriented'
+    cache = resolve_cached_bodies(design, load_dimension_cache(cache_path, design_key)) if use_cache else {}
+    seen_tokens = set()
+    measured_count = 0
+
+    # Work out how many times each component is used
+    instance_counts = get_component_instance_counts(design) if OCCURRENCE_AWARE else None
+    
+    # Use defaultdict to count identical cuts
+    cut_counts = defaultdict(int)
+    cut_details = {}
+    
+    # Process each component
+    for component in components:
+        quantity = instance_counts[component.id] if OCCURRENCE_AWARE else 1
+        if quantity == 0:
+            continue
+
+        # Get all bodies in the component
+        bodies = component.bRepBodies
+        
+        for body in bodies:
+            # Get dimensions
+            if use_cache:
+                dimensions, was_measured = get_cached_body_dimensions(body, cache, design_version, seen_tokens)
+                if was_measured:
+                    measured_count += 1
+            else:
+                dimensions = measure_body(body)
+            length = dimensions[0]  # Longest dimension
+            width = dimensions[1]   # Second longest
+            height = dimensions[2]  # Shortest
+            
+            # Create a key for identical cuts (only using dimensions)
+            cut_key = (width, height, length)
+            
+            # Store the details for this cut (only if we haven't seen these dimensions before)
+            if cut_key not in cut_details:
+                cut_details[cut_key] = {
+                    'Material Width': width,
+                    'Material Height': height,
+                    'Length to Cut': length,
+                    'Body Name': body.name,
+                    'Component Name': component.name
+                }
+            
+            # Increment the count for this cut
+            cut_counts[cut_key] += quantity
+
+    if GROUPING_TOLERANCE > 0:
+        cut_counts, cut_details = group_within_tolerance(cut_counts, cut_details, GROUPING_TOLERANCE)
+
+    if use_cache:
+        # Drop bodies that no longer exist so the cache doesn't grow forever
+        cache = {token: entry for token, entry in cache.items() if token in seen_tokens}
+        save_dimension_cache(cache_path, design_key, design_version, cache)
+        app.log(f'Cut list measured {measured_count} of {len(seen_tokens)} bodies, the rest came from the cache.')
+
+    return cut_counts, cut_details
+
+def iter_cut_rows(cut_counts, cut_details):
+    """Yield the cut list rows one at a time in the configured group and sort order."""
+    for cut_key in writers.sorted_keys(cut_counts, cut_details, GROUP_KEYS, SORT_KEYS, SORT_DESCENDING):
+        row = dict(cut_details[cut_key], QTY=cut_counts[cut_key])
+        if GROUP_KEYS:
+            row['Group'] = ' x '.join(str(row[column]) for column in GROUP_KEYS)
+        yield row
+
+def write_cut_list(basepath, cut_counts, cut_details, extra_fields=()):
+    """Write the grouped cuts in every configured output format and return the file names."""
+    fieldnames = ['QTY', 'Material Width', 'Material Height', 'Body Name', 'Component Name', 'Length to Cut']
+    fieldnames.extend(extra_fields)
+    if GROUP_KEYS:
+        fieldnames.insert(0, 'Group')
+    paths = writers.write_rows(basepath, OUTPUT_FORMATS, fieldnames, iter_cut_rows(cut_counts, cut_details))
+    return [os.path.basename(path) for path in paths]
+
+def write_reports(output_dir, prefix, cut_counts, cut_details):
+    """Write the cut list and the optional cutting plan and sheet layouts, returning a summary message."""
+    filenames = write_cut_list(os.path.join(output_dir, prefix), cut_counts, cut_details)
+    message = f'Cut list has been created successfully!\nSaved as: {", ".join(filenames)}'
+
+    if OPTIMIZE_STOCK:
+        plan_filename = f'{prefix}_plan.csv'
+        write_cutting_plan(os.path.join(output_dir, plan_filename), cut_counts)
+        message += f'\nCutting plan saved as: {plan_filename}'
+
+    if NEST_PANELS:
+        layout_filename = f'{prefix}_sheets.csv'
+        dxf_dir = os.path.join(output_dir, f'{prefix}_sheets')
+        sheet_count = write_sheet_layouts(os.path.join(output_dir, layout_filename), dxf_dir, cut_counts, cut_details)
+        if sheet_count:
+            message += f'\nPanels nested on {sheet_count} sheets, saved as: {layout_filename}'
+
+    return message
+
+def get_batch_data_files():
+    """Return (data files to process in batch mode, ids in BATCH_DATA_FILE_IDS that weren't found)."""
+    if BATCH_DATA_FILE_IDS:
+        data_files = []
+        missing = []
+        for file_id in BATCH_DATA_FILE_IDS:
+            try:
+                data_file = app.data.findFileById(file_id)
+            except RuntimeError:
+                data_file = None
+            if data_file:
+                data_files.append(data_file)
+            else:
+                missing.append(file_id)
+        return data_files, missing
+
+    # Walk every folder of the active project looking for designs
+    data_files = []
+    folders = [app.data.activeProject.rootFolder]
+    while folders:
+        folder = folders.pop()
+        for data_file in folder.dataFiles:
+            if data_file.fileExtension == 'f3d':
+                data_files.append(data_file)
+        folders.extend(folder.dataFolders)
+    return data_files, []
+
+def load_checkpoint(checkpoint_path):
+    """Load the per-design results of an earlier, possibly interrupted, batch run."""
+    if not os.path.exists(checkpoint_path):
+        return {}
+    try:
+        with open(checkpoint_path, 'r') as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """Save the per-design results so an interrupted batch run can resume."""
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, checkpoint_path)
+
+def safe_filename(name):
+    """Replace characters that aren't allowed in file names."""
+    return ''.join(char if char.isalnum() or char in ' -_.' else '_' for char in name).strip()
+
+def batch_output_name(data_file):
+    """Return the per-design file name, the id keeps designs with the same name in different folders apart."""
+    return f'{safe_filename(data_file.name)}_{safe_filename(data_file.id.split(":")[-1])}_v{data_file.versionNumber}'
+
+def run_batch(script_dir):
+    """Create a cut list for every design in the batch plus one merged report."""
+    output_dir = os.path.join(script_dir, BATCH_FOLDER_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, BATCH_CHECKPOINT_FILENAME)
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    data_files, missing = get_batch_data_files()
+    progress_dialog = ui.createProgressDialog()
+    progress_dialog.isCancelButtonShown = True
+    progress_dialog.show('Creating cut lists...', '%v of %m designs', 0, len(data_files))
+
+    processed_keys = set()
+    for index, data_file in enumerate(data_files):
+        if progress_dialog.wasCancelled:
+            break
+        progress_dialog.progressValue = index
+        adsk.doEvents()
+
+        # A design only needs to be processed again when a new version has been saved
+        checkpoint_key = f'{data_file.id}:{data_file.versionNumber}'
+        processed_keys.add(checkpoint_key)
+        if checkpoint_key in checkpoint:
+            continue
+
+        document = app.documents.open(data_file, False)
+        try:
+            design = adsk.fusion.Design.cast(document.products.itemByProductType('DesignProductType'))
+            cut_counts, cut_details = collect_cuts(design, script_dir)
+        finally:
+            document.close(False)
+
+        # Keep only the extracted dimensions, the document itself is closed
+        checkpoint[checkpoint_key] = {
+            'name': data_file.name,
+            'cuts': [[width, height, length, count,
+                      cut_details[(width, height, length)]['Body Name'],
+                      cut_details[(width, height, length)]['Component Name']]
+                     for (width, height, length), count in cut_counts.items()]
+        }
+        save_checkpoint(checkpoint_path, checkpoint)
+        write_cut_list(os.path.join(output_dir, batch_output_name(data_file)), cut_counts, cut_details)
+
+    progress_dialog.hide()
+    if progress_dialog.wasCancelled:
+        ui.messageBox('Batch cancelled. Run the script again to resume where it stopped.')
+        return
+
+    # Merge the designs of this batch into one de-duplicated report
+    exact_counts = defaultdict(int)
+    exact_details = {}
+    exact_designs = defaultdict(set)
+    for checkpoint_key in sorted(processed_keys):
+        result = checkpoint[checkpoint_key]
+        for width, height, length, count, body_name, component_name in result['cuts']:
+            cut_key = (width, height, length)
+            exact_counts[cut_key] += count
+            exact_designs[cut_key].add(result['name'])
+            if cut_key not in exact_details:
+                exact_details[cut_key] = {
+                    'Material Width': width,
+                    'Material Height': height,
+                    'Length to Cut': length,
+                    'Body Name': body_name,
+                    'Component Name': component_name
+                }
+
+    if GROUPING_TOLERANCE > 0:
+        merged_counts, merged_details = group_within_tolerance(exact_counts, exact_details, GROUPING_TOLERANCE)
+        mapping = grouping.group_cuts(exact_counts, GROUPING_TOLERANCE)
+    else:
+        merged_counts, merged_details = exact_counts, exact_details
+        mapping = {cut_key: cut_key for cut_key in exact_counts}
+
+    merged_designs = defaultdict(set)
+    for cut_key, designs in exact_designs.items():
+        merged_designs[mapping[cut_key]].update(designs)
+    for cut_key, details in merged_details.items():
+        details['Designs'] = '; '.join(sorted(merged_designs[cut_key]))
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filenames = write_cut_list(os.path.join(output_dir, f'merged_cut_list_{timestamp}'),
+                               merged_counts, merged_details, ['Designs'])
+
+    # The batch finished, start fresh next time
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    message = f'Cut lists created for {len(processed_keys)} designs.\nMerged report saved as: {", ".join(filenames)}'
+    if missing:
+        message += '\n\nThese data file ids were not found and were skipped:\n' + '\n'.join(missing)
+    ui.messageBox(message)
+
 def run(_context: str):
     """This function is called by Fusion when the script is run."""
 
     try:
+        # Get the script directory
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+
+        if BATCH_MODE:
+            run_batch(script_dir)
+            return
+
         # Get the active design
         design = app.activeProduct
         if not design:
             ui.messageBox('No active design found.')
             return
-            
-        # Get all components in the design
-        components = design.allComponents
-        
-        # Use defaultdict to count identical cuts
-        cut_counts = defaultdict(int)
-        cut_details = {}
-        
-        # Process each component
-        for component in components:
-            # Get all bodies in the component
-            bodies = component.bRepBodies
-            
-            for body in bodies:
-                # Get dimensions
-                dimensions = get_body_dimensions(body)
-                length = dimensions[0]  # Longest dimension
-                width = dimensions[1]   # Second longest
-                height = dimensions[2]  # Shortest
-                
-                # Create a key for identical cuts (only using dimensions)
-                cut_key = (width, height, length)
-                
-                # Store the details for this cut (only if we haven't seen these dimensions before)
-                if cut_key not in cut_details:
-                    cut_details[cut_key] = {
-                        'Material Width': width,
-                        'Material Height': height,
-                        'Length to Cut': length,
-                        'Body Name': body.name,
-                        'Component Name': component.name
-                    }
-                
-                # Increment the count for this cut
-                cut_counts[cut_key] += 1
+
+        cut_counts, cut_details = collect_cuts(design, script_dir)
         
-        # Create CSV file
+        # Create the reports
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'cut_list_{timestamp}.csv'
-        
-        # Get the script directory
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        filepath = os.path.join(script_dir, filename)
-        
-        # Write to CSV
-        with open(filepath, 'w', newline='') as csvfile:
-            fieldnames = ['QTY', 'Material Width', 'Material Height', 'Body Name', 'Component Name', 'Length to Cut']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for cut_key, count in cut_counts.items():
-                row = cut_details[cut_key].copy()
-                row['QTY'] = count
-                writer.writerow(row)
-        
-        ui.messageBox(f'Cut list has been created successfully!\nSaved as: {filename}')
+        message = write_reports(script_dir, f'cut_list_{timestamp}', cut_counts, cut_details)
+        ui.messageBox(message)
         
     except:  #pylint:disable=bare-except
         # Write the error message to the TEXT COMMANDS window.
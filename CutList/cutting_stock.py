@@ -0,0 +1,251 @@
+"""1D cutting stock optimizer that lays out cut lengths on stock bars.
+
+Lengths are plain numbers in whatever unit the caller uses (CutList passes inches).
+Kerf is handled by growing every piece and every bar by one kerf width, so a bar
+of length L holds pieces p1..pn when sum(p + kerf) <= L + kerf.
+"""
+
+import math
+import time
+
+# Refinement is skipped when distinct lengths x knapsack capacity is above this, one pass of a
+# larger problem takes longer than any reasonable time budget and first fit decreasing is kept
+MAX_REFINE_CELLS = 300_000
+
+
+def lower_bound(demand, stock_length, kerf):
+    """Return the minimum number of bars of a single stock length that could hold the demand."""
+    total = sum((length + kerf) * qty for length, qty in demand.items())
+    return math.ceil(total / (stock_length + kerf) - 1e-9)
+
+
+def split_oversize(demand, stock_lengths):
+    """Split the demand into pieces that fit the longest stock and pieces that don't."""
+    longest = max(stock_lengths)
+    fits = {}
+    oversize = {}
+    for length, qty in demand.items():
+        if qty <= 0:
+            continue
+        if length > longest + 1e-9:
+            oversize[length] = qty
+        else:
+            fits[length] = qty
+    return fits, oversize
+
+
+def shrink_bars(bars, stock_lengths, kerf):
+    """Move every bar to the shortest stock length that still holds its cuts."""
+    sorted_stock = sorted(stock_lengths)
+    for bar in bars:
+        used = sum(cut + kerf for cut in bar['cuts']) - kerf
+        for stock_length in sorted_stock:
+            if used <= stock_length + 1e-9:
+                bar['stock_length'] = stock_length
+                break
+        bar['waste'] = round(bar['stock_length'] - used, 4)
+    return bars
+
+
+def first_fit_decreasing(demand, stock_lengths, kerf):
+    """Place pieces longest first into the first bar with room, opening bars of the longest stock."""
+    capacity = max(stock_lengths) + kerf
+    smallest = min(demand) + kerf if demand else 0
+    bars = []
+    open_bars = []
+
+    for length in sorted(demand, reverse=True):
+        size = length + kerf
+        # Bars skipped for this length can't take another piece of the same length later
+        start = 0
+        for _ in range(demand[length]):
+            placed = False
+            for index in range(start, len(open_bars)):
+                bar = open_bars[index]
+                if bar['remaining'] >= size - 1e-9:
+                    bar['cuts'].append(length)
+                    bar['remaining'] -= size
+                    start = index
+                    placed = True
+                    break
+            if not placed:
+                bar = {'cuts': [length], 'remaining': capacity - size}
+                bars.append(bar)
+                open_bars.append(bar)
+                start = len(open_bars) - 1
+
+        # Stop scanning bars that can't take even the smallest piece
+        open_bars = [bar for bar in open_bars if bar['remaining'] >= smallest - 1e-9]
+
+    result = [{'stock_length': max(stock_lengths), 'cuts': bar['cuts']} for bar in bars]
+    return shrink_bars(result, stock_lengths, kerf)
+
+
+def solve_knapsack(items, capacity, deadline=None):
+    """Bounded knapsack over integer weights.
+
+    items is a list of (length, weight, value, count). Returns {length: count} of the best pattern,
+    or None if the deadline (a time.perf_counter() value) passed before it was solved.
+    """
+    best = [0.0] * (capacity + 1)
+    choices = []
+    for length, weight, value, count in items:
+        count = min(count, capacity // weight)
+        # Binary splitting turns the bounded item into a few 0/1 items
+        batch = 1
+        while count > 0:
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            take = min(batch, count)
+            count -= take
+            batch *= 2
+            batch_weight = weight * take
+            batch_value = value * take
+            taken = bytearray(capacity + 1)
+            for c in range(capacity, batch_weight - 1, -1):
+                candidate = best[c - batch_weight] + batch_value
+                if candidate > best[c]:
+                    best[c] = candidate
+                    taken[c] = 1
+            choices.append((length, take, batch_weight, taken))
+
+    pattern = {}
+    c = capacity
+    for length, take, batch_weight, taken in reversed(choices):
+        if taken[c]:
+            pattern[length] = pattern.get(length, 0) + take
+            c -= batch_weight
+    return pattern
+
+
+def build_with_values(demand, stock_lengths, kerf, values, resolution, deadline=None):
+    """Build a full plan by repeatedly taking the best valued pattern and using it as often as possible.
+
+    Returns None if the deadline passed before the plan was complete.
+    """
+    remaining = dict(demand)
+    bars = []
+    while remaining:
+        best_pattern = None
+        best_score = -1.0
+        best_stock = None
+        for stock_length in stock_lengths:
+            capacity = int((stock_length + kerf) / resolution + 1e-9)
+            items = []
+            for length, qty in remaining.items():
+                weight = max(1, math.ceil((length + kerf) / resolution - 1e-9))
+                if weight <= capacity:
+                    items.append((length, weight, values[length], qty))
+            if not items:
+                continue
+            pattern = solve_knapsack(items, capacity, deadline)
+            if pattern is None:
+                return None
+            if not pattern:
+                continue
+            # Prefer patterns that return the most value per unit of stock
+            score = sum(values[length] * count for length, count in pattern.items()) / (stock_length + kerf)
+            if score > best_score:
+                best_score = score
+                best_pattern = pattern
+                best_stock = stock_length
+
+        if not best_pattern:
+            # Pieces that only fit once rounding is ignored, give them a bar each
+            for length, qty in remaining.items():
+                bars.extend({'stock_length': max(stock_lengths), 'cuts': [length]} for _ in range(qty))
+            break
+
+        repeats = min(remaining[length] // count for length, count in best_pattern.items())
+        cuts = sorted((length for length, count in best_pattern.items() for _ in range(count)), reverse=True)
+        for _ in range(repeats):
+            bars.append({'stock_length': best_stock, 'cuts': list(cuts)})
+        for length, count in best_pattern.items():
+            remaining[length] -= count * repeats
+            if remaining[length] == 0:
+                del remaining[length]
+
+    return shrink_bars(bars, stock_lengths, kerf)
+
+
+def total_stock(bars):
+    """Return the total length of stock used by a plan."""
+    return sum(bar['stock_length'] for bar in bars)
+
+
+def refine(demand, stock_lengths, kerf, bars, time_budget, resolution):
+    """Improve a plan with sequential value correction.
+
+    Each pass prices patterns with a knapsack, like the pricing step of column generation,
+    then raises the value of pieces that ended up in wasteful patterns so the next pass
+    packs them earlier. The best plan seen within the time budget is returned, a pass that
+    runs past the deadline is abandoned.
+    """
+    best_bars = bars
+    best_cost = total_stock(bars)
+    capacity = int((max(stock_lengths) + kerf) / resolution + 1e-9)
+    if len(demand) * capacity > MAX_REFINE_CELLS:
+        return best_bars
+    target = min(lower_bound(demand, stock_length, kerf) * stock_length for stock_length in stock_lengths)
+    values = {length: length + kerf for length in demand}
+    deadline = time.perf_counter() + time_budget
+
+    while best_cost > target + 1e-9 and time.perf_counter() < deadline:
+        plan = build_with_values(demand, stock_lengths, kerf, values, resolution, deadline)
+        if plan is None:
+            break
+        cost = total_stock(plan)
+        if cost < best_cost - 1e-9:
+            best_bars = plan
+            best_cost = cost
+
+        # Correct the piece values by how wasteful the bars they landed in were
+        totals = {length: 0.0 for length in demand}
+        for bar in plan:
+            used = sum(cut + kerf for cut in bar['cuts'])
+            ratio = (bar['stock_length'] + kerf) / used
+            for cut in bar['cuts']:
+                totals[cut] += (cut + kerf) * ratio
+        changed = False
+        for length, qty in demand.items():
+            corrected = 0.5 * values[length] + 0.5 * totals[length] / qty
+            if abs(corrected - values[length]) > 1e-6:
+                changed = True
+            values[length] = corrected
+        if not changed:
+            break
+
+    return best_bars
+
+
+def optimize_cuts(demand, stock_lengths, kerf=0.0, time_budget=2.0, resolution=1 / 32):
+    """Lay out the demanded lengths on stock bars.
+
+    demand maps each length to the quantity needed. Returns (bars, oversize) where bars is a
+    list of {'stock_length', 'cuts', 'waste'} and oversize maps lengths longer than any stock
+    to their quantity.
+    """
+    if not stock_lengths:
+        raise ValueError('At least one stock length is required.')
+
+    fits, oversize = split_oversize(demand, stock_lengths)
+    if not fits:
+        return [], oversize
+
+    bars = first_fit_decreasing(fits, stock_lengths, kerf)
+    if time_budget > 0:
+        bars = refine(fits, stock_lengths, kerf, bars, time_budget, resolution)
+    return bars, oversize
+
+
+def group_bars(bars):
+    """Collapse identical bars into (quantity, bar) pairs, longest stock first."""
+    counts = {}
+    for bar in bars:
+        key = (bar['stock_length'], tuple(bar['cuts']))
+        if key in counts:
+            counts[key][0] += 1
+        else:
+            counts[key] = [1, bar]
+    return sorted(((qty, bar) for qty, bar in counts.values()),
+                  key=lambda item: (-item[1]['stock_length'], item[1]['waste']))
@@ -0,0 +1,42 @@
+"""Tolerance based grouping of cut dimensions.
+
+Cuts are clustered one axis at a time: sorted by length, split wherever a value is more than
+the tolerance away from the first value of its cluster, then the same again for width and
+height inside each cluster. Sorting keeps it O(n log n) and the result doesn't depend on the
+order the bodies were found in.
+"""
+
+
+def split_by_axis(keys, axis, tolerance):
+    """Split keys into clusters whose values on one axis are within tolerance of the cluster's smallest value."""
+    clusters = []
+    current = []
+    anchor = None
+    for key in sorted(keys, key=lambda key: (key[axis], key)):
+        if current and key[axis] - anchor > tolerance + 1e-12:
+            clusters.append(current)
+            current = []
+        if not current:
+            anchor = key[axis]
+        current.append(key)
+    if current:
+        clusters.append(current)
+    return clusters
+
+
+def group_cuts(cut_counts, tolerance, axes=(2, 0, 1)):
+    """Group (width, height, length) cut keys whose dimensions all agree within tolerance.
+
+    Returns a dict mapping each original key to its group key. The group key uses the largest
+    value on each axis so the material picked for the group is never too small.
+    """
+    clusters = [list(cut_counts)]
+    for axis in axes:
+        clusters = [part for cluster in clusters for part in split_by_axis(cluster, axis, tolerance)]
+
+    mapping = {}
+    for cluster in clusters:
+        group_key = tuple(max(key[index] for key in cluster) for index in range(3))
+        for key in cluster:
+            mapping[key] = group_key
+    return mapping
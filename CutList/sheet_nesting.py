@@ -0,0 +1,272 @@
+"""2D sheet nesting that lays rectangular panel parts out on standard sheets.
+
+Parts and sheets are plain numbers in whatever unit the caller uses (CutList passes inches).
+Kerf is handled by growing every part and the sheet by one kerf width, so parts placed
+edge to edge always leave a saw cut between them.
+"""
+
+import bisect
+import math
+
+
+class FreeRectangles:
+    """Free space of a sheet, indexed by a coarse grid so overlap queries only touch nearby rectangles."""
+
+    def __init__(self, width, height, cells=16):
+        self.cell_size = max(width, height) / cells
+        self.rects = {}
+        self.grid = {}
+        self.next_id = 0
+        # Sizes of the free rectangles no other one is both wider and taller than, recomputed
+        # lazily after the free space changes
+        self.bounds = None
+        self.add(0.0, 0.0, width, height)
+
+    def cell_range(self, x, y, w, h):
+        """Return the grid cells covered by a rectangle."""
+        x0 = int(x // self.cell_size)
+        y0 = int(y // self.cell_size)
+        x1 = int(max(x, x + w - 1e-9) // self.cell_size)
+        y1 = int(max(y, y + h - 1e-9) // self.cell_size)
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def add(self, x, y, w, h):
+        """Add a free rectangle and return its id."""
+        rect_id = self.next_id
+        self.next_id += 1
+        self.rects[rect_id] = (x, y, w, h)
+        self.bounds = None
+        for cell in self.cell_range(x, y, w, h):
+            self.grid.setdefault(cell, set()).add(rect_id)
+        return rect_id
+
+    def remove(self, rect_id):
+        """Remove a free rectangle."""
+        x, y, w, h = self.rects.pop(rect_id)
+        self.bounds = None
+        for cell in self.cell_range(x, y, w, h):
+            self.grid[cell].discard(rect_id)
+
+    def near(self, x, y, w, h):
+        """Return the ids of free rectangles sharing a grid cell with a rectangle."""
+        found = set()
+        for cell in self.cell_range(x, y, w, h):
+            found.update(self.grid.get(cell, ()))
+        return found
+
+    def sizes(self):
+        """Return (widths ascending, matching heights descending) of the free rectangles that aren't dominated."""
+        if self.bounds is None:
+            widths = []
+            heights = []
+            for w, h in sorted(((rect[2], rect[3]) for rect in self.rects.values()), reverse=True):
+                if not heights or h > heights[-1]:
+                    widths.append(w)
+                    heights.append(h)
+            widths.reverse()
+            heights.reverse()
+            self.bounds = (widths, heights)
+        return self.bounds
+
+    def fits(self, w, h, allow_rotation):
+        """Return True if some free rectangle can take the part, without scoring every rectangle."""
+        widths, heights = self.sizes()
+        for part_w, part_h in (((w, h), (h, w)) if allow_rotation else ((w, h),)):
+            # The first rectangle at least part_w wide is the tallest of those wide enough
+            index = bisect.bisect_left(widths, part_w - 1e-9)
+            if index < len(widths) and heights[index] >= part_h - 1e-9:
+                return True
+        return False
+
+    def best_fit(self, w, h, allow_rotation):
+        """Find the free rectangle that fits a part with the least leftover on its short side.
+
+        Returns (rect_id, rotated) or None.
+        """
+        best = None
+        best_score = (math.inf, math.inf)
+        for rect_id, (_, _, free_w, free_h) in self.rects.items():
+            for rotated in ((False, True) if allow_rotation else (False,)):
+                part_w, part_h = (h, w) if rotated else (w, h)
+                if part_w > free_w + 1e-9 or part_h > free_h + 1e-9:
+                    continue
+                leftover_w = free_w - part_w
+                leftover_h = free_h - part_h
+                score = (min(leftover_w, leftover_h), max(leftover_w, leftover_h))
+                if score < best_score:
+                    best_score = score
+                    best = (rect_id, rotated)
+                    if score[1] < 1e-9:
+                        return best
+        return best
+
+
+def overlaps(a, b):
+    """Return True if two (x, y, w, h) rectangles overlap."""
+    return (a[0] < b[0] + b[2] - 1e-9 and b[0] < a[0] + a[2] - 1e-9 and
+            a[1] < b[1] + b[3] - 1e-9 and b[1] < a[1] + a[3] - 1e-9)
+
+
+def contains(outer, inner):
+    """Return True if the outer (x, y, w, h) rectangle contains the inner one."""
+    return (inner[0] >= outer[0] - 1e-9 and inner[1] >= outer[1] - 1e-9 and
+            inner[0] + inner[2] <= outer[0] + outer[2] + 1e-9 and
+            inner[1] + inner[3] <= outer[1] + outer[3] + 1e-9)
+
+
+def place_maxrects(free, used):
+    """Split every free rectangle the placed part overlaps, then drop rectangles contained in others."""
+    new_rects = []
+    for rect_id in free.near(*used):
+        rect = free.rects[rect_id]
+        if not overlaps(rect, used):
+            continue
+        free.remove(rect_id)
+        x, y, w, h = rect
+        ux, uy, uw, uh = used
+        if ux > x:
+            new_rects.append((x, y, ux - x, h))
+        if ux + uw < x + w:
+            new_rects.append((ux + uw, y, x + w - ux - uw, h))
+        if uy > y:
+            new_rects.append((x, y, w, uy - y))
+        if uy + uh < y + h:
+            new_rects.append((x, uy + uh, w, y + h - uy - uh))
+
+    for rect in new_rects:
+        if rect[2] <= 1e-9 or rect[3] <= 1e-9:
+            continue
+        nearby = free.near(*rect)
+        if any(contains(free.rects[other], rect) for other in nearby):
+            continue
+        for other in nearby:
+            if contains(rect, free.rects[other]):
+                free.remove(other)
+        free.add(*rect)
+
+
+def place_guillotine(free, rect_id, used):
+    """Split the chosen free rectangle in two with a single straight cut along its shorter leftover."""
+    x, y, w, h = free.rects[rect_id]
+    free.remove(rect_id)
+    _, _, uw, uh = used
+    leftover_w = w - uw
+    leftover_h = h - uh
+    if leftover_w < leftover_h:
+        # Cut across the full width, leaving a long strip above
+        right = (x + uw, y, leftover_w, uh)
+        top = (x, y + uh, w, leftover_h)
+    else:
+        # Cut across the full height, leaving a long strip to the right
+        right = (x + uw, y, leftover_w, h)
+        top = (x, y + uh, uw, leftover_h)
+    for rect in (right, top):
+        if rect[2] > 1e-9 and rect[3] > 1e-9:
+            free.add(*rect)
+
+
+def nest_parts(parts, sheet_length, sheet_width, kerf=0.0, heuristic='maxrects', grain_locked=True):
+    """Nest rectangular parts onto sheets.
+
+    parts is a list of {'name', 'length', 'width'} dicts. With grain_locked the part length
+    always runs along the sheet length. Returns (sheets, unplaced) where each sheet is a list of
+    {'name', 'x', 'y', 'length', 'width', 'rotated'} placements.
+    """
+    if heuristic not in ('maxrects', 'guillotine'):
+        raise ValueError(f'Unknown nesting heuristic: {heuristic}')
+
+    capacity_length = sheet_length + kerf
+    capacity_width = sheet_width + kerf
+    sheets = []
+    # Sheets that could still take one of the remaining parts, in the order they were started
+    open_sheets = []
+    unplaced = []
+
+    # Biggest parts first, ties broken by name so the layout is repeatable
+    ordered = sorted(parts, key=lambda part: (-part['length'] * part['width'], -part['length'], part['name']))
+    # Smallest grown sides among the parts from each position on, (length, width) when grain locked
+    # and (short, long) otherwise. A sheet that can't fit that size can't take any later part.
+    smallest_after = [None] * len(ordered)
+    smallest = (math.inf, math.inf)
+    for index in range(len(ordered) - 1, -1, -1):
+        sides = (ordered[index]['length'] + kerf, ordered[index]['width'] + kerf)
+        if not grain_locked:
+            sides = tuple(sorted(sides))
+        smallest = (min(smallest[0], sides[0]), min(smallest[1], sides[1]))
+        smallest_after[index] = smallest
+
+    for index, part in enumerate(ordered):
+        part_w = part['length'] + kerf
+        part_h = part['width'] + kerf
+        fits_sheet = part_w <= capacity_length + 1e-9 and part_h <= capacity_width + 1e-9
+        fits_rotated = not grain_locked and part_h <= capacity_length + 1e-9 and part_w <= capacity_width + 1e-9
+        if not fits_sheet and not fits_rotated:
+            unplaced.append(part)
+            continue
+
+        placed = False
+        for free, placements in open_sheets:
+            if not free.fits(part_w, part_h, not grain_locked):
+                continue
+            if place_on_sheet(free, placements, part, part_w, part_h, heuristic, grain_locked):
+                placed = True
+                break
+        if not placed:
+            free = FreeRectangles(capacity_length, capacity_width)
+            placements = []
+            place_on_sheet(free, placements, part, part_w, part_h, heuristic, grain_locked)
+            sheets.append(placements)
+            open_sheets.append((free, placements))
+
+        if index + 1 < len(ordered):
+            open_sheets = [sheet for sheet in open_sheets if sheet[0].fits(*smallest_after[index + 1], not grain_locked)]
+
+    return sheets, unplaced
+
+
+def place_on_sheet(free, placements, part, part_w, part_h, heuristic, grain_locked):
+    """Try to place a part on a sheet, returning True if it fit."""
+    fit = free.best_fit(part_w, part_h, not grain_locked)
+    if not fit:
+        return False
+    rect_id, rotated = fit
+    x, y, _, _ = free.rects[rect_id]
+    used = (x, y, part_h, part_w) if rotated else (x, y, part_w, part_h)
+    if heuristic == 'guillotine':
+        place_guillotine(free, rect_id, used)
+    else:
+        place_maxrects(free, used)
+    placements.append({
+        'name': part['name'],
+        'x': round(x, 4),
+        'y': round(y, 4),
+        'length': part['width'] if rotated else part['length'],
+        'width': part['length'] if rotated else part['width'],
+        'rotated': rotated
+    })
+    return True
+
+
+def write_sheet_dxf(filepath, placements, sheet_length, sheet_width):
+    """Write a sheet layout as an ASCII DXF with the sheet outline and one labelled rectangle per part."""
+    lines = ['0', 'SECTION', '2', 'ENTITIES']
+
+    def add_rectangle(x, y, w, h, layer):
+        corners = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+        for index, start in enumerate(corners):
+            end = corners[(index + 1) % 4]
+            lines.extend(['0', 'LINE', '8', layer,
+                          '10', f'{start[0]:.4f}', '20', f'{start[1]:.4f}', '30', '0.0',
+                          '11', f'{end[0]:.4f}', '21', f'{end[1]:.4f}', '31', '0.0'])
+
+    add_rectangle(0.0, 0.0, sheet_length, sheet_width, 'Sheet')
+    for placement in placements:
+        add_rectangle(placement['x'], placement['y'], placement['length'], placement['width'], 'Parts')
+        text_height = max(min(placement['length'], placement['width']) / 8, 0.1)
+        lines.extend(['0', 'TEXT', '8', 'Labels',
+                      '10', f'{placement["x"] + text_height:.4f}', '20', f'{placement["y"] + text_height:.4f}', '30', '0.0',
+                      '40', f'{text_height:.4f}', '1', placement['name']])
+
+    lines.extend(['0', 'ENDSEC', '0', 'EOF'])
+    with open(filepath, 'w') as dxf_file:
+        dxf_file.write('\n'.join(lines) + '\n')
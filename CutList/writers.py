@@ -0,0 +1,109 @@
+"""Row writers for the cut list reports.
+
+Every writer takes rows one at a time, so a report is written as it is produced rather than
+collected in memory first. XLSX output needs openpyxl, which can be installed into Fusion's
+Python with the PackageManager script.
+"""
+
+import csv
+import json
+
+# openpyxl is optional, it is only needed for XLSX output
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class CsvRowWriter:
+    """Write rows to a CSV file."""
+
+    extension = '.csv'
+
+    def __init__(self, filepath, fieldnames):
+        self.file = open(filepath, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxRowWriter:
+    """Write rows to an XLSX workbook using openpyxl's streaming write-only mode."""
+
+    extension = '.xlsx'
+
+    def __init__(self, filepath, fieldnames):
+        if openpyxl is None:
+            raise RuntimeError('XLSX output needs openpyxl. Install it with the PackageManager script.')
+        self.filepath = filepath
+        self.fieldnames = fieldnames
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Cut List')
+        self.sheet.append(fieldnames)
+
+    def write_row(self, row):
+        self.sheet.append([row.get(field) for field in self.fieldnames])
+
+    def close(self):
+        self.workbook.save(self.filepath)
+
+
+class JsonLinesRowWriter:
+    """Write rows to a JSON Lines file, one object per line."""
+
+    extension = '.jsonl'
+
+    def __init__(self, filepath, fieldnames):
+        self.fieldnames = fieldnames
+        self.file = open(filepath, 'w')
+
+    def write_row(self, row):
+        self.file.write(json.dumps({field: row.get(field) for field in self.fieldnames}) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+WRITERS = {
+    'csv': CsvRowWriter,
+    'xlsx': XlsxRowWriter,
+    'jsonl': JsonLinesRowWriter
+}
+
+
+def write_rows(basepath, formats, fieldnames, rows):
+    """Stream rows into one file per format and return the paths written.
+
+    basepath is the output path without an extension. rows can be any iterable, it is only
+    walked once.
+    """
+    unknown = [fmt for fmt in formats if fmt not in WRITERS]
+    if unknown:
+        raise ValueError(f'Unknown output format: {", ".join(unknown)}')
+
+    writers = []
+    try:
+        for fmt in formats:
+            writer_class = WRITERS[fmt]
+            writers.append(writer_class(basepath + writer_class.extension, fieldnames))
+        for row in rows:
+            for writer in writers:
+                writer.write_row(row)
+    finally:
+        for writer in writers:
+            writer.close()
+    return [basepath + WRITERS[fmt].extension for fmt in formats]
+
+
+def sorted_keys(keys, details, group_keys, sort_keys, descending=False):
+    """Order keys by the group columns and then the sort columns of their details."""
+    columns = list(group_keys) + [column for column in sort_keys if column not in group_keys]
+    if not columns:
+        return list(keys)
+    return sorted(keys, key=lambda key: tuple(details[key].get(column) for column in columns),
+                  reverse=descending)
@@ -1,4 +1,63 @@
 import adsk.core, adsk.fusion, adsk.cam, traceback
+import os
+from . import parameterExpressions
+from . import parameterSchema
+
+# Schema the file dialog opens on, ships next to this script
+DEFAULT_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spiralStair.json')
+
+def getSchemaFile(ui):
+    # Set up file dialog
+    fileDialog = ui.createFileDialog()
+    fileDialog.isMultiSelectEnabled = False
+    fileDialog.title = 'Select Parameter Schema'
+    fileDialog.filter = 'Parameter schemas (*.json;*.yaml;*.yml)|*.json;*.yaml;*.yml'
+    fileDialog.initialDirectory = os.path.dirname(DEFAULT_SCHEMA)
+    fileDialog.initialFilename = os.path.basename(DEFAULT_SCHEMA)
+
+    # Show file dialog
+    dialogResult = fileDialog.showOpen()
+    if (dialogResult == adsk.core.DialogResults.DialogOK):
+        return fileDialog.filename
+    return None
+
+def installParameters(design, specs):
+    # Creates or updates the parameters so running the same schema twice changes nothing
+    # Returns (added, updated, unchanged, errors)
+    userParams = design.userParameters
+    current = {param.name: param for param in userParams}
+    specNames = {spec['name'] for spec in specs}
+
+    # Parameters outside the schema can be referenced, the schema's own are checked as a batch
+    existing = {name: (param.value, param.unit) for name, param in current.items() if name not in specNames}
+    ordered, values, errors = parameterExpressions.orderParameters(specs, existing)
+
+    added = updated = unchanged = 0
+    wasDeferred = design.isComputeDeferred
+    design.isComputeDeferred = True
+    try:
+        for spec in ordered:
+            param = current.get(spec['name'])
+            if not param:
+                userParams.add(spec['name'], adsk.core.ValueInput.createByString(spec['expression']), spec['unit'], spec['comment'])
+                added += 1
+                continue
+
+            sameExpression = parameterSchema.normalizeExpression(param.expression) == parameterSchema.normalizeExpression(spec['expression'])
+            if sameExpression and param.comment == spec['comment']:
+                unchanged += 1
+                continue
+            if param.unit != spec['unit']:
+                errors.append('{}: exists with unit "{}", the schema asks for "{}"'.format(spec['name'], param.unit, spec['unit']))
+                continue
+            if not sameExpression:
+                param.expression = spec['expression']
+            param.comment = spec['comment']
+            updated += 1
+    finally:
+        design.isComputeDeferred = wasDeferred
+
+    return added, updated, unchanged, errors
 
 def createParameters():
     app = adsk.core.Application.get()
@@ -11,32 +70,23 @@ def createParameters():
             ui.messageBox('No active Fusion design', 'Error')
             return
 
-        # Get the Parameters collection
-        userParams = design.userParameters
-
-        NumTreads = 20
-
-        # Create parameters
-        userParams.add('innerRadius', adsk.core.ValueInput.createByReal(2.0 * 2.54), 'cm', 'Inner radius of the spiral')
-        userParams.add('outerRadius', adsk.core.ValueInput.createByReal(32.0 * 2.54), 'cm', 'Outer radius of the spiral')
-        userParams.add('height', adsk.core.ValueInput.createByReal(145.75 * 2.54), 'cm', 'Height of the spiral')
-        userParams.add('firstTreadHeight', adsk.core.ValueInput.createByReal(7.0 * 2.54), 'cm', 'First tread height')
-        userParams.add('startingAngle', adsk.core.ValueInput.createByReal(0.1), 'deg', 'Starting angle of the spiral')
-        userParams.add('endingAngle', adsk.core.ValueInput.createByReal(360.0), 'deg', 'Ending angle of the spiral')
-        userParams.add('numTreads', adsk.core.ValueInput.createByReal(20), '', 'Number of treads')
-        userParams.add('math', adsk.core.ValueInput.createByString("20 + 3"), '', 'Number of treads')
-
-
-        TypicalRise = (145.75 / NumTreads)*2.54
+        schemaFile = getSchemaFile(ui)
+        if not schemaFile:
+            ui.messageBox('No schema selected. Operation cancelled.')
+            return
 
-        for i in range(NumTreads):
-            t=i+1
-            strT="treadRise*"+str(t)
-            userParams.add('treadRise{}'.format(t), adsk.core.ValueInput.createByString(strT), 'in', 'Rise for tread {}'.format(t))
-            userParams.add('treadAngle{}'.format(t), adsk.core.ValueInput.createByReal(TypicalRise*t), 'deg', 'Angle for tread {}'.format(t))
+        try:
+            specs = parameterSchema.loadSchema(schemaFile)
+        except (OSError, parameterSchema.SchemaError) as e:
+            ui.messageBox('Could not load {}:\n{}'.format(os.path.basename(schemaFile), e), 'Error')
+            return
 
+        added, updated, unchanged, errors = installParameters(design, specs)
 
-        ui.messageBox('Parameters created successfully')
+        message = 'Added {}, updated {}, {} already up to date.'.format(added, updated, unchanged)
+        if errors:
+            message += '\n\nNot created:\n' + '\n'.join(errors)
+        ui.messageBox(message, 'Parameters')
 
     except:
         if ui:
@@ -0,0 +1,457 @@
+"""Offline checker for Fusion parameter expressions.
+
+Parses expressions like "treadRise * 2" or "sqrt(height ^ 2 + 3 in ^ 2)", works out which
+parameters depend on which, orders a batch so every parameter comes after the ones it uses,
+and evaluates each one with unit checking. Everything happens in plain Python so problems
+with a whole batch can be reported before anything is sent to Fusion.
+
+Values are kept in Fusion's internal units, centimeters and radians.
+"""
+
+import math
+import re
+
+# Scale of each unit to the internal unit and its dimension as (length power, angle power)
+UNITS = {
+    '': (1.0, (0, 0)),
+    'mm': (0.1, (1, 0)),
+    'cm': (1.0, (1, 0)),
+    'm': (100.0, (1, 0)),
+    'km': (100000.0, (1, 0)),
+    'in': (2.54, (1, 0)),
+    'ft': (30.48, (1, 0)),
+    'yd': (91.44, (1, 0)),
+    'mi': (160934.4, (1, 0)),
+    'deg': (math.pi / 180, (0, 1)),
+    'rad': (1.0, (0, 1)),
+}
+
+CONSTANTS = {
+    'PI': math.pi,
+    'E': math.e,
+}
+
+NO_UNITS = (0, 0)
+
+
+class ExpressionError(Exception):
+    """Raised when an expression can't be parsed, evaluated or has the wrong units."""
+
+
+class Quantity:
+    """A value in internal units with its dimension.
+
+    Bare numbers without a unit are flexible: Fusion reads them in the unit of whatever they
+    are combined with, so they are allowed next to lengths and angles in sums.
+    """
+
+    def __init__(self, value, dims=NO_UNITS, flexible=False):
+        self.value = value
+        self.dims = dims
+        self.flexible = flexible
+
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*)|(.))')
+
+
+def tokenize(expression):
+    """Split an expression into ('number' | 'name' | 'op', text) tokens."""
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            break
+        number, name, op = match.groups()
+        if number is not None:
+            tokens.append(('number', number))
+        elif name is not None:
+            tokens.append(('name', name))
+        elif op is not None and not op.isspace():
+            if op not in '+-*/^(),':
+                raise ExpressionError(f'Unexpected character "{op}" in "{expression}"')
+            tokens.append(('op', op))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser producing a small tuple based syntax tree."""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, op=None):
+        token = self.peek()
+        if op is not None and token != ('op', op):
+            raise ExpressionError(f'Expected "{op}" in "{self.expression}"')
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ExpressionError('Empty expression')
+        node = self.parseSum()
+        if self.position != len(self.tokens):
+            raise ExpressionError(f'Unexpected "{self.peek()[1]}" in "{self.expression}"')
+        return node
+
+    def parseSum(self):
+        node = self.parseProduct()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.take()[1]
+            node = (op, node, self.parseProduct())
+        return node
+
+    def parseProduct(self):
+        node = self.parseUnary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.take()[1]
+            node = (op, node, self.parseUnary())
+        return node
+
+    def parseUnary(self):
+        if self.peek() in (('op', '-'), ('op', '+')):
+            op = self.take()[1]
+            operand = self.parseUnary()
+            return ('neg', operand) if op == '-' else operand
+        return self.parsePower()
+
+    def parsePower(self):
+        node = self.parseAtom()
+        if self.peek() == ('op', '^'):
+            self.take()
+            # Powers are right associative and bind tighter than a leading minus on the exponent
+            node = ('^', node, self.parseUnary())
+        return node
+
+    def parseAtom(self):
+        kind, text = self.take()
+        if kind == 'number':
+            # A unit straight after a number belongs to it, "3 in" or "45 deg"
+            nextKind, nextText = self.peek()
+            if nextKind == 'name' and nextText in UNITS:
+                self.take()
+                return ('number', float(text), nextText)
+            return ('number', float(text), '')
+        if kind == 'name':
+            if self.peek() == ('op', '('):
+                self.take()
+                args = []
+                if self.peek() != ('op', ')'):
+                    args.append(self.parseSum())
+                    while self.peek() == ('op', ','):
+                        self.take()
+                        args.append(self.parseSum())
+                self.take(')')
+                return ('call', text, args)
+            return ('name', text)
+        if (kind, text) == ('op', '('):
+            node = self.parseSum()
+            self.take(')')
+            return node
+        raise ExpressionError(f'Unexpected end of "{self.expression}"' if kind is None
+                              else f'Unexpected "{text}" in "{self.expression}"')
+
+
+def parse(expression):
+    """Parse an expression into a syntax tree."""
+    return Parser(str(expression)).parse()
+
+
+def references(node):
+    """Return the names of the parameters a syntax tree uses."""
+    kind = node[0]
+    if kind == 'name':
+        return set() if node[1] in CONSTANTS else {node[1]}
+    if kind == 'number':
+        return set()
+    if kind == 'call':
+        found = set()
+        for arg in node[2]:
+            found |= references(arg)
+        return found
+    found = set()
+    for child in node[1:]:
+        found |= references(child)
+    return found
+
+
+def formatDims(dims):
+    names = []
+    for unit, power in zip(('length', 'angle'), dims):
+        if power == 1:
+            names.append(unit)
+        elif power:
+            names.append(f'{unit}^{power}')
+    return ' * '.join(names) or 'unitless'
+
+
+def matchUnits(left, right, op, scales):
+    """Give a bare number the units of the other operand, returns both operands in the same units."""
+    if left.dims != right.dims:
+        if left.flexible and left.dims == NO_UNITS:
+            left = Quantity(left.value * scales.get(right.dims, 1.0), right.dims)
+        elif right.flexible and right.dims == NO_UNITS:
+            right = Quantity(right.value * scales.get(left.dims, 1.0), left.dims)
+        else:
+            raise ExpressionError(f'Can\'t {"add" if op == "+" else "subtract"} '
+                                  f'{formatDims(left.dims)} and {formatDims(right.dims)}')
+    return left, right
+
+
+def combineSum(left, right, op, scales):
+    left, right = matchUnits(left, right, op, scales)
+    value = left.value + right.value if op == '+' else left.value - right.value
+    return Quantity(value, left.dims, left.flexible and right.flexible)
+
+
+def scaleDims(dims, factor):
+    scaled = tuple(power * factor for power in dims)
+    if any(power != int(power) for power in scaled):
+        raise ExpressionError(f'Can\'t raise {formatDims(dims)} to the power {factor}')
+    return tuple(int(power) for power in scaled)
+
+
+def callFunction(name, args, scales):
+    """Evaluate one of Fusion's built in functions."""
+    def unitless(index=0):
+        arg = args[index]
+        if arg.dims != NO_UNITS:
+            raise ExpressionError(f'{name}() expects a unitless value, got {formatDims(arg.dims)}')
+        return arg.value
+
+    def angle():
+        # Trig functions take angles, bare numbers are read as radians
+        arg = args[0]
+        if arg.dims not in (NO_UNITS, (0, 1)):
+            raise ExpressionError(f'{name}() expects an angle, got {formatDims(arg.dims)}')
+        return arg.value
+
+    expected = {'min': None, 'max': None, 'pow': 2}.get(name, 1)
+    if expected is not None and len(args) != expected:
+        raise ExpressionError(f'{name}() takes {expected} argument{"s" if expected != 1 else ""}')
+    if expected is None and not args:
+        raise ExpressionError(f'{name}() needs at least one argument')
+
+    try:
+        if name in ('sin', 'cos', 'tan'):
+            return Quantity(getattr(math, name)(angle()))
+        if name in ('asin', 'acos', 'atan'):
+            return Quantity(getattr(math, name)(unitless()), (0, 1))
+        if name in ('sinh', 'cosh', 'tanh', 'exp', 'ln', 'log'):
+            function = {'ln': math.log, 'log': math.log10}.get(name) or getattr(math, name)
+            return Quantity(function(unitless()))
+        if name == 'sqrt':
+            return Quantity(math.sqrt(args[0].value), scaleDims(args[0].dims, 0.5))
+        if name == 'abs':
+            return Quantity(abs(args[0].value), args[0].dims, args[0].flexible)
+        if name in ('floor', 'ceil', 'round'):
+            function = {'floor': math.floor, 'ceil': math.ceil, 'round': round}[name]
+            return Quantity(float(function(args[0].value)), args[0].dims, args[0].flexible)
+        if name == 'sign':
+            return Quantity(float((args[0].value > 0) - (args[0].value < 0)))
+        if name == 'pow':
+            return power(args[0], args[1])
+        if name in ('min', 'max'):
+            result = args[0]
+            for arg in args[1:]:
+                # Reuse the sum rules so mixed units are caught, and keep the operand in the scaled units
+                candidate, current = matchUnits(arg, result, '-', scales)
+                result = candidate if (candidate.value - current.value < 0) == (name == 'min') else current
+            return result
+    except ValueError as e:
+        raise ExpressionError(f'{name}(): {e}')
+    raise ExpressionError(f'Unknown function "{name}"')
+
+
+def power(base, exponent):
+    if exponent.dims != NO_UNITS:
+        raise ExpressionError('Exponents must be unitless')
+    try:
+        value = base.value ** exponent.value
+    except (OverflowError, ZeroDivisionError) as e:
+        raise ExpressionError(f'Power failed: {e}')
+    if isinstance(value, complex):
+        raise ExpressionError('Power of a negative value gave a complex result')
+    return Quantity(value, scaleDims(base.dims, exponent.value), base.flexible)
+
+
+def evaluateNode(node, values, scales):
+    """Evaluate a syntax tree, looking parameters up in values ({name: Quantity}).
+
+    scales maps a dimension to the scale bare numbers are read in when they are added to it.
+    """
+    kind = node[0]
+    if kind == 'number':
+        scale, dims = UNITS[node[2]]
+        return Quantity(node[1] * scale, dims, node[2] == '')
+    if kind == 'name':
+        if node[1] in CONSTANTS:
+            return Quantity(CONSTANTS[node[1]])
+        if node[1] not in values:
+            raise ExpressionError(f'Unknown parameter "{node[1]}"')
+        return values[node[1]]
+    if kind == 'call':
+        return callFunction(node[1], [evaluateNode(arg, values, scales) for arg in node[2]], scales)
+    if kind == 'neg':
+        operand = evaluateNode(node[1], values, scales)
+        return Quantity(-operand.value, operand.dims, operand.flexible)
+
+    left = evaluateNode(node[1], values, scales)
+    right = evaluateNode(node[2], values, scales)
+    if kind in ('+', '-'):
+        return combineSum(left, right, kind, scales)
+    if kind == '*':
+        dims = tuple(a + b for a, b in zip(left.dims, right.dims))
+        return Quantity(left.value * right.value, dims, left.flexible and right.flexible)
+    if kind == '/':
+        if right.value == 0:
+            raise ExpressionError('Division by zero')
+        dims = tuple(a - b for a, b in zip(left.dims, right.dims))
+        return Quantity(left.value / right.value, dims, left.flexible and right.flexible)
+    if kind == '^':
+        return power(left, right)
+    raise ExpressionError(f'Unknown operation "{kind}"')
+
+
+def evaluate(expression, unit='', values=None):
+    """Evaluate an expression for a parameter with the given unit and return its value in internal units."""
+    if unit not in UNITS:
+        raise ExpressionError(f'Unknown unit "{unit}"')
+    scale, dims = UNITS[unit]
+    # Bare numbers are read in the parameter's own unit, or centimeters and degrees otherwise
+    scales = {(1, 0): 1.0, (0, 1): UNITS['deg'][0]}
+    scales[dims] = scale
+    result = evaluateNode(parse(expression), values or {}, scales)
+    if result.dims == dims:
+        return result.value
+    # A bare number is read in the parameter's own unit, like Fusion does
+    if result.flexible and result.dims == NO_UNITS:
+        return result.value * scale
+    raise ExpressionError(f'Expression is {formatDims(result.dims)} but the parameter unit "{unit}" '
+                          f'is {formatDims(dims)}')
+
+
+def findCycle(graph, nodes):
+    """Return one dependency cycle among nodes as a list of names."""
+    visiting = []
+    onPath = set()
+    done = set()
+
+    def visit(name):
+        visiting.append(name)
+        onPath.add(name)
+        for dependency in sorted(graph[name]):
+            if dependency not in nodes or dependency in done:
+                continue
+            if dependency in onPath:
+                return visiting[visiting.index(dependency):] + [dependency]
+            cycle = visit(dependency)
+            if cycle:
+                return cycle
+        visiting.pop()
+        onPath.discard(name)
+        done.add(name)
+        return None
+
+    for name in sorted(nodes):
+        if name not in done:
+            cycle = visit(name)
+            if cycle:
+                return cycle
+    return []
+
+
+def orderParameters(specs, existing=None):
+    """Check a batch of parameters and order them so each comes after the ones it uses.
+
+    specs is a list of {'name', 'expression', 'unit'} dicts. existing maps the names of
+    parameters already in the design to (value, unit). Returns (ordered specs, {name: value}
+    in internal units, errors) where errors is a list of messages. Specs with errors, and any
+    that depend on them, are left out of the ordered list.
+    """
+    existing = existing or {}
+    values = {name: Quantity(value, UNITS.get(unit, UNITS[''])[1]) for name, (value, unit) in existing.items()}
+    errors = []
+
+    byName = {}
+    graph = {}
+    for spec in specs:
+        name = spec['name']
+        if name in byName:
+            errors.append(f'{name}: defined more than once')
+            continue
+        if not re.match(r'^[A-Za-z_]\w*$', name):
+            errors.append(f'{name}: not a valid parameter name')
+            continue
+        try:
+            tree = parse(spec['expression'])
+        except ExpressionError as e:
+            errors.append(f'{name}: {e}')
+            continue
+        byName[name] = (spec, tree)
+        graph[name] = references(tree)
+
+    for name, dependencies in graph.items():
+        if name in dependencies:
+            errors.append(f'{name}: refers to itself')
+
+    # Kahn's algorithm, parameters defined in the design already are satisfied up front
+    waitingOn = {name: {d for d in dependencies if d in graph} for name, dependencies in graph.items()}
+    users = {name: [] for name in graph}
+    for name, dependencies in waitingOn.items():
+        for dependency in dependencies:
+            users[dependency].append(name)
+    ready = sorted(name for name, dependencies in waitingOn.items() if not dependencies)
+    orderedNames = []
+    while ready:
+        name = ready.pop(0)
+        orderedNames.append(name)
+        for user in users[name]:
+            waitingOn[user].discard(name)
+            if not waitingOn[user]:
+                ready.append(user)
+
+    stuck = set(graph) - set(orderedNames)
+    inCycle = {name for name, dependencies in graph.items() if name in dependencies}
+    while stuck:
+        cycle = findCycle(graph, stuck)
+        if not cycle:
+            break
+        if len(cycle) > 2:
+            # Every member is reported, each with the cycle starting from it
+            members = cycle[:-1]
+            for index, member in enumerate(members):
+                path = members[index:] + members[:index + 1]
+                errors.append(f'{member}: circular reference {" -> ".join(path)}')
+        inCycle.update(cycle)
+        stuck -= set(cycle)
+    # Everything left over only waits on a cycle
+    for name in sorted(set(graph) - set(orderedNames) - inCycle):
+        errors.append(f'{name}: depends on a circular reference')
+
+    ordered = []
+    failed = set()
+    for name in orderedNames:
+        spec, tree = byName[name]
+        if graph[name] & failed:
+            failed.add(name)
+            errors.append(f'{name}: depends on {", ".join(sorted(graph[name] & failed))} which has errors')
+            continue
+        try:
+            value = evaluate(spec['expression'], spec.get('unit', ''), values)
+        except ExpressionError as e:
+            failed.add(name)
+            errors.append(f'{name}: {e}')
+            continue
+        values[name] = Quantity(value, UNITS[spec.get('unit', '')][1])
+        ordered.append(spec)
+
+    return ordered, {name: values[name].value for name in byName if name in values}, errors
@@ -0,0 +1,113 @@
+"""Loads parameter sets described in JSON or YAML files.
+
+A schema looks like this:
+
+    {
+        "constants": {"N": 20},
+        "parameters": [
+            {"name": "numTreads", "expression": "{N}", "comment": "Number of treads"},
+            {"name": "treadRise{1..N}", "expression": "treadRise * {n}", "unit": "in",
+             "comment": "Rise for tread {n}"}
+        ]
+    }
+
+A name containing {a..b} is expanded into one parameter per whole number from a to b, where
+a and b are numbers or constants. {n} in any field is replaced by that number and {NAME} by
+the value of a constant.
+"""
+
+import json
+import os
+import re
+
+# PyYAML is optional, JSON schemas work without it
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+RANGE_PATTERN = re.compile(r'\{(\w+)\.\.(\w+)\}')
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+class SchemaError(Exception):
+    """Raised when a schema file can't be read or is malformed."""
+
+
+def loadSchemaFile(path):
+    """Read a schema file, JSON or YAML depending on the extension."""
+    with open(path, 'r') as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+        if yaml is None:
+            raise SchemaError('YAML schemas need PyYAML. Install it with the PackageManager script or use JSON.')
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise SchemaError(f'{os.path.basename(path)}: {e}')
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise SchemaError(f'{os.path.basename(path)}: {e}')
+
+
+def substitute(text, constants, index=None):
+    """Replace {n} with the range index and {NAME} with constants."""
+    def replace(match):
+        key = match.group(1)
+        if key == 'n' and index is not None:
+            return str(index)
+        if key in constants:
+            return str(constants[key])
+        raise SchemaError(f'Unknown placeholder "{{{key}}}" in "{text}"')
+    return PLACEHOLDER_PATTERN.sub(replace, str(text))
+
+
+def resolveBound(bound, constants):
+    if bound in constants:
+        bound = constants[bound]
+    try:
+        return int(bound)
+    except (TypeError, ValueError):
+        raise SchemaError(f'Range bound "{bound}" is not a whole number or constant')
+
+
+def expandSchema(schema):
+    """Turn a loaded schema into a flat list of {'name', 'expression', 'unit', 'comment'} specs."""
+    if not isinstance(schema, dict) or not isinstance(schema.get('parameters'), list):
+        raise SchemaError('A schema needs a "parameters" list')
+    constants = schema.get('constants') or {}
+
+    specs = []
+    for entry in schema['parameters']:
+        if not isinstance(entry, dict) or 'name' not in entry or 'expression' not in entry:
+            raise SchemaError(f'Every parameter needs a name and an expression: {entry}')
+
+        name = str(entry['name'])
+        match = RANGE_PATTERN.search(name)
+        if match:
+            start = resolveBound(match.group(1), constants)
+            stop = resolveBound(match.group(2), constants)
+            indices = range(start, stop + 1)
+        else:
+            indices = [None]
+
+        for index in indices:
+            specName = name[:match.start()] + str(index) + name[match.end():] if match else name
+            specs.append({
+                'name': substitute(specName, constants, index),
+                'expression': substitute(entry['expression'], constants, index),
+                'unit': substitute(entry.get('unit', ''), constants, index),
+                'comment': substitute(entry.get('comment', ''), constants, index)
+            })
+    return specs
+
+
+def loadSchema(path):
+    """Load a schema file and return its expanded parameter specs."""
+    return expandSchema(loadSchemaFile(path))
+
+
+def normalizeExpression(expression):
+    """Fusion reformats expressions, so compare them without whitespace."""
+    return re.sub(r'\s+', '', str(expression))
@@ -1,6 +1,35 @@
 import adsk.core, adsk.fusion, adsk.cam, traceback
-import pandas as pd
+import csv
+import hashlib
+import json
+import math
+import os
 import re
+import threading
+import time
+
+# openpyxl reads only the requested cells, pandas is imported lazily as a fallback when it's missing
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Watch mode: after an import the script can keep running and re-import whenever the workbook is saved
+WATCH_POLL_SECONDS = 1.0
+# Wait until the workbook has stopped changing for this long before re-importing
+WATCH_DEBOUNCE_SECONDS = 2.0
+SHEET_CHANGED_EVENT_ID = 'ParametricSpreadsheetImport_SheetChanged'
+
+# Sync mode keeps a journal next to the workbook recording the values both sides had at the last sync
+SYNC_JOURNAL_SUFFIX = '.sync.json'
+# Workbooks with formulas are never saved from Python, openpyxl can't calculate them and saving
+# drops every formula's cached value. Values Fusion changed are written to this file next to it instead.
+SYNC_COMPANION_SUFFIX = '.fusion.csv'
+
+# Global set of event handlers to keep them referenced while watching
+handlers = []
+# The workbook being watched, the design it imports into, the import settings and the values read last time
+watchState = {}
 
 def getExcelFile():
     app = adsk.core.Application.get()
@@ -24,12 +53,276 @@ def getExcelFile():
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
         return None
 
+def isNull(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def readParameterRows(excelFile, nameCol, valueCol, startRow, stopRow):
+    # Yields (sheet row, name, value) for the data rows startRow..stopRow (1-based, the first sheet row is the header)
+    if openpyxl:
+        # Read-only mode streams the sheet and only the needed column span is loaded
+        workbook = openpyxl.load_workbook(excelFile, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            firstCol = min(nameCol, valueCol)
+            lastCol = max(nameCol, valueCol)
+            rows = sheet.iter_rows(min_row=startRow + 1, max_row=stopRow + 1,
+                                   min_col=firstCol + 1, max_col=lastCol + 1, values_only=True)
+            for sheetRow, row in enumerate(rows, start=startRow + 1):
+                row = tuple(row) + (None,) * (lastCol - firstCol + 1 - len(row))
+                yield sheetRow, row[nameCol - firstCol], row[valueCol - firstCol]
+        finally:
+            workbook.close()
+        return
+
+    import pandas as pd
+    columns = sorted({nameCol, valueCol})
+    df = pd.read_excel(excelFile, usecols=columns, skiprows=range(1, startRow), nrows=stopRow - startRow + 1)
+    nameIndex = columns.index(nameCol)
+    valueIndex = columns.index(valueCol)
+    for sheetRow, row in enumerate(df.itertuples(index=False), start=startRow + 1):
+        yield sheetRow, row[nameIndex], row[valueIndex]
+
+def readSheetParameters(excelFile, nameCol, valueCol, startRow, stopRow, rows=None):
+    # Returns ({name: value} in sheet order, True if reading stopped at 5 consecutive null rows)
+    # If rows is given it is filled with the sheet row of each parameter
+    params = {}
+    null_row_count = 0
+    for sheetRow, raw_name, raw_value in readParameterRows(excelFile, nameCol, valueCol, startRow, stopRow):
+        if isNull(raw_name) or isNull(raw_value):
+            null_row_count += 1
+            if null_row_count >= 5:
+                return params, True
+            continue
+        else:
+            null_row_count = 0
+
+        param_name = str(raw_name).replace(' ', '_').replace('.', '_').replace('#', 'Num')
+        params[param_name] = float(raw_value)
+        if rows is not None:
+            rows[param_name] = sheetRow
+    return params, False
+
+def valuesDiffer(a, b):
+    return abs(a - b) > 1e-9 * max(1.0, abs(a), abs(b))
+
+def diffParameters(existing, desired):
+    # existing maps names to current values, desired maps names to sheet values
+    adds = {name: value for name, value in desired.items() if name not in existing}
+    updates = {name: value for name, value in desired.items()
+               if name in existing and valuesDiffer(existing[name], value)}
+    deletes = [name for name in existing if name not in desired]
+    return adds, updates, deletes
+
+def applyParameterChanges(design, adds, updates, deletes):
+    # Applies the changes with compute deferred so the model only recomputes once
+    # Returns the failures as (action, name, reason) with action one of 'Add', 'Update' and 'Delete'
+    userParams = design.userParameters
+    failures = []
+    wasDeferred = design.isComputeDeferred
+    design.isComputeDeferred = True
+    try:
+        for name, value in updates.items():
+            try:
+                userParams.itemByName(name).value = value
+            except RuntimeError as e:
+                failures.append(('Update', name, str(e)))
+
+        for name, value in adds.items():
+            try:
+                userParams.add(name, adsk.core.ValueInput.createByReal(value), '', '')
+            except RuntimeError as e:
+                failures.append(('Add', name, str(e)))
+
+        for name in deletes:
+            param = userParams.itemByName(name)
+            # Parameters that are still referenced can't be deleted
+            try:
+                if not param or not param.deleteMe():
+                    failures.append(('Delete', name, 'parameter is in use'))
+            except RuntimeError as e:
+                failures.append(('Delete', name, str(e)))
+    finally:
+        design.isComputeDeferred = wasDeferred
+    return failures
+
+def formatFailure(failure):
+    action, name, reason = failure
+    return f'{action} {name}: {reason}'
+
+def loadSyncJournal(journalPath):
+    if not os.path.exists(journalPath):
+        return {'parameters': {}}
+    try:
+        with open(journalPath, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Without a journal every difference is reported as a conflict, nothing is overwritten
+        return {'parameters': {}}
+
+def saveSyncJournal(journalPath, journal):
+    tempPath = journalPath + '.tmp'
+    with open(tempPath, 'w') as f:
+        json.dump(journal, f, indent=1)
+    os.replace(tempPath, journalPath)
+
+def planSync(sheet, fusion, journal):
+    # Compares both sides with the values recorded at the last sync
+    # Returns ({name: value} to set in Fusion, {name: value} to write to the sheet, conflicts, notes)
+    toFusion = {}
+    toSheet = {}
+    conflicts = []
+    notes = []
+    entries = journal['parameters']
+
+    for name in list(sheet) + [name for name in fusion if name not in sheet]:
+        sheetValue = sheet.get(name)
+        fusionValue = fusion.get(name)
+        entry = entries.get(name)
+
+        if entry is None:
+            # Never synced, only copy when one side doesn't have it yet
+            if sheetValue is not None and fusionValue is not None:
+                if valuesDiffer(sheetValue, fusionValue):
+                    conflicts.append(f'{name}: sheet has {sheetValue:g}, Fusion has {fusionValue:g} and it was never synced')
+            elif sheetValue is not None:
+                toFusion[name] = sheetValue
+            else:
+                toSheet[name] = fusionValue
+            continue
+
+        if sheetValue is None:
+            notes.append(f'{name}: no longer in the selected rows of the sheet, left alone')
+            continue
+        if fusionValue is None:
+            notes.append(f'{name}: deleted in Fusion, left alone')
+            continue
+
+        sheetChanged = valuesDiffer(sheetValue, entry['sheet'])
+        fusionChanged = valuesDiffer(fusionValue, entry['fusion'])
+        if sheetChanged and fusionChanged and valuesDiffer(sheetValue, fusionValue):
+            conflicts.append(f'{name}: changed on both sides, sheet has {sheetValue:g}, Fusion has {fusionValue:g}')
+        elif sheetChanged:
+            toFusion[name] = sheetValue
+        elif fusionChanged:
+            toSheet[name] = fusionValue
+
+    return toFusion, toSheet, conflicts, notes
+
+def workbookHasFormulas(excelFile):
+    # True if any cell of any sheet holds a formula
+    workbook = openpyxl.load_workbook(excelFile, read_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                if any(isinstance(value, str) and value.startswith('=') for value in row):
+                    return True
+        return False
+    finally:
+        workbook.close()
+
+def writeCompanionValues(companionPath, values, rows):
+    # Writes the values Fusion changed for the user to copy into the sheet
+    with open(companionPath, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Name', 'Value', 'Sheet Row'])
+        for name, value in values.items():
+            writer.writerow([name, value, rows.get(name, '')])
+
+def writeSheetValues(excelFile, nameCol, valueCol, startRow, stopRow, values, rows):
+    # Writes only the given cells, new parameters go in the first empty row of the range
+    # Returns {name: sheet row} of the values written and a list of problems
+    workbook = openpyxl.load_workbook(excelFile)
+    sheet = workbook.worksheets[0]
+    written = {}
+    problems = []
+    nextRow = startRow + 1
+    for name, value in values.items():
+        row = rows.get(name)
+        if row is None:
+            while nextRow <= stopRow + 1 and sheet.cell(row=nextRow, column=nameCol + 1).value is not None:
+                nextRow += 1
+            row = nextRow
+            nextRow += 1
+            if row > stopRow + 1:
+                problems.append(f'{name}: written to row {row - 1}, past the stop row, widen the range to keep syncing it')
+            sheet.cell(row=row, column=nameCol + 1).value = name
+
+        sheet.cell(row=row, column=valueCol + 1).value = value
+        written[name] = row
+
+    if written:
+        workbook.save(excelFile)
+    return written, problems
+
+def syncParameters(design, excelFile, nameCol, valueCol, startRow, stopRow):
+    # Two way sync between the selected rows of the sheet and the user parameters, returns a summary
+    if not openpyxl:
+        return 'Sync needs openpyxl to write the workbook. Install it with the PackageManager script.'
+
+    journalPath = excelFile + SYNC_JOURNAL_SUFFIX
+    journal = loadSyncJournal(journalPath)
+
+    rows = {}
+    sheet, _ = readSheetParameters(excelFile, nameCol, valueCol, startRow, stopRow, rows)
+    fusion = {param.name: param.value for param in design.userParameters}
+    toFusion, toSheet, conflicts, notes = planSync(sheet, fusion, journal)
+
+    existing = {name: fusion[name] for name in toFusion if name in fusion}
+    adds, updates, _ = diffParameters(existing, toFusion)
+    failures = applyParameterChanges(design, adds, updates, [])
+    failedNames = {name for _, name, _ in failures}
+
+    # Values only recorded in the companion file aren't agreed yet, they are offered again next sync
+    companionPath = excelFile + SYNC_COMPANION_SUFFIX
+    written, problems = {}, []
+    if toSheet and workbookHasFormulas(excelFile):
+        writeCompanionValues(companionPath, toSheet, rows)
+        problems.append(f'The workbook has formulas and saving it would drop their calculated values, so it was not changed. '
+                        f'Copy the {len(toSheet)} values Fusion changed from {os.path.basename(companionPath)} into the sheet.')
+    else:
+        if toSheet:
+            written, problems = writeSheetValues(excelFile, nameCol, valueCol, startRow, stopRow, toSheet, rows)
+        if os.path.exists(companionPath):
+            os.remove(companionPath)
+
+    # Record the values both sides now agree on, bumping the version stamp of each one that changed
+    agreed = {name: value for name, value in toFusion.items() if name not in failedNames}
+    agreed.update((name, toSheet[name]) for name in written)
+    for name, value in sheet.items():
+        if name not in agreed and name in fusion and not valuesDiffer(value, fusion[name]):
+            agreed[name] = value
+
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+    entries = journal['parameters']
+    for name, value in agreed.items():
+        entry = entries.get(name)
+        if entry and not valuesDiffer(entry['sheet'], value) and not valuesDiffer(entry['fusion'], value):
+            continue
+        version = entry['version'] + 1 if entry else 1
+        entries[name] = {'sheet': value, 'fusion': value, 'version': version, 'syncedAt': stamp}
+    saveSyncJournal(journalPath, journal)
+
+    message = f'Updated {len(toFusion) - len(failedNames)} parameters in Fusion and {len(written)} cells in the sheet.'
+    for title, lines in (('Conflicts, nothing changed', conflicts), ('Failed', [formatFailure(failure) for failure in failures] + problems), ('Notes', notes)):
+        if lines:
+            message += f'\n\n{title}:\n' + '\n'.join(lines)
+    return message
+
 def createParameters():
     app = adsk.core.Application.get()
     if not app:
         return
     ui = app.userInterface
     try:
+        modeResult = ui.inputBox('Enter "import" to import from the sheet or "sync" to sync both ways', 'Mode', 'import')
+        if not modeResult or modeResult[1]:
+            ui.messageBox('Mode input cancelled. Operation aborted.')
+            return
+        mode = modeResult[0].strip().lower()
+        if mode not in ('import', 'sync'):
+            ui.messageBox(f'Unknown mode "{mode}". Operation aborted.')
+            return
+
         paramNameResult = ui.inputBox('Enter column index for parameter name', 'Parameter Name Column', '0')
         if not paramNameResult or paramNameResult[1]:
             ui.messageBox('Column input cancelled. Operation aborted.')
@@ -65,37 +358,195 @@ def createParameters():
             ui.messageBox('No active Fusion design', 'Error')
             return
 
-        # Get the Parameters collection
-        userParams = design.userParameters
+        if mode == 'sync':
+            ui.messageBox(syncParameters(design, excelFile, paramNameCol, paramValueCol, startRow, stopRow), 'Sync Complete')
+            return
 
         # Read parameters from selected Excel file
-        df = pd.read_excel(excelFile)
-
-        null_row_count = 0
-        for i in range(startRow - 1, stopRow):
-            row = df.iloc[i]
-            param_name = str(row[paramNameCol]).replace(' ', '_').replace('.', '_').replace('#', 'Num')
-            param_value = float(row[paramValueCol])
-
-            if pd.isnull(param_name) or pd.isnull(param_value):
-                null_row_count += 1
-                if null_row_count >= 5:
-                    ui.messageBox('Encountered 5 consecutive null rows. Ending program.', 'Import Complete')
-                    return
-                continue
-            else:
-                null_row_count = 0
+        desired, stoppedEarly = readSheetParameters(excelFile, paramNameCol, paramValueCol, startRow, stopRow)
+
+        # Read the current parameters once and work out what actually changed
+        existing = {param.name: param.value for param in design.userParameters}
+        adds, updates, deletes = diffParameters(existing, desired)
+
+        # Parameters that aren't in the sheet may come from somewhere else, so only delete them when asked
+        if deletes:
+            result = ui.messageBox(f'{len(deletes)} parameters are not in the selected rows of the sheet. Delete them?',
+                                   'Delete Parameters', adsk.core.MessageBoxButtonTypes.YesNoButtonType)
+            if result != adsk.core.DialogResults.DialogYes:
+                deletes = []
+
+        failures = applyParameterChanges(design, adds, updates, deletes)
+
+        failedCount = {action: sum(1 for failed, _, _ in failures if failed == action) for action in ('Add', 'Update', 'Delete')}
+        message = (f'Added {len(adds) - failedCount["Add"]}, updated {len(updates) - failedCount["Update"]}, '
+                   f'deleted {len(deletes) - failedCount["Delete"]} parameters.')
+        if stoppedEarly:
+            message += '\nEncountered 5 consecutive null rows, the rest of the sheet was skipped.'
+        if failures:
+            message += '\n\nFailed:\n' + '\n'.join(formatFailure(failure) for failure in failures)
+        ui.messageBox(message, 'Import Complete')
+
+        return {
+            'excelFile': excelFile,
+            'nameCol': paramNameCol,
+            'valueCol': paramValueCol,
+            'startRow': startRow,
+            'stopRow': stopRow,
+            'values': desired,
+            'design': design,
+            'document': design.parentDocument
+        }
+
+    except:
+        if ui:
+            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+def hashFile(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def watchWorkbook(path, stopFlag):
+    # Runs on a background thread, only polls the file and hands changes to the main thread
+    app = adsk.core.Application.get()
+    try:
+        lastModified = os.path.getmtime(path)
+        lastHash = hashFile(path)
+    except OSError:
+        lastModified = None
+        lastHash = None
+    changedAt = None
 
+    while not stopFlag.wait(WATCH_POLL_SECONDS):
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            # Excel replaces the file when saving, it can briefly be missing
+            continue
+
+        if modified != lastModified:
+            lastModified = modified
+            changedAt = time.monotonic()
+            continue
+
+        if changedAt is not None and time.monotonic() - changedAt >= WATCH_DEBOUNCE_SECONDS:
+            changedAt = None
             try:
-                userParams.add(param_name, adsk.core.ValueInput.createByReal(param_value), '', '')
-            except RuntimeError as e:
-                ui.messageBox(f'Failed to add parameter: {param_name}. Error: {e}', 'Error')
+                contentHash = hashFile(path)
+            except OSError:
                 continue
+            # Saving without edits changes the time but not the contents
+            if contentHash != lastHash:
+                lastHash = contentHash
+                app.fireCustomEvent(SHEET_CHANGED_EVENT_ID, path)
+
+def reimportChangedParameters():
+    # Called on the main thread when the watched workbook has changed
+    # Changes always go to the design the import was made into, whichever document is active now
+    app = adsk.core.Application.get()
+    design = watchState.get('design')
+    if not design or not watchState['document'].isValid:
+        return
+
+    desired, _ = readSheetParameters(watchState['excelFile'], watchState['nameCol'], watchState['valueCol'],
+                                     watchState['startRow'], watchState['stopRow'])
+    previous = watchState['values']
+    changed = {name: value for name, value in desired.items()
+               if name not in previous or valuesDiffer(previous[name], value)}
+    watchState['values'] = desired
+    if not changed:
+        return
+
+    # Only look up the parameters whose cells changed
+    userParams = design.userParameters
+    existing = {}
+    for name in changed:
+        param = userParams.itemByName(name)
+        if param:
+            existing[name] = param.value
+    adds, updates, _ = diffParameters(existing, changed)
+
+    # Watch mode never deletes, rows removed from the sheet are left alone
+    failures = applyParameterChanges(design, adds, updates, [])
+    app.log(f'Spreadsheet changed: added {len(adds)}, updated {len(updates)} parameters.')
+    for failure in failures:
+        app.log(f'Failed: {formatFailure(failure)}')
+
+class DocumentClosingHandler(adsk.core.DocumentEventHandler):
+    def __init__(self):
+        super().__init__()
+    def notify(self, args):
+        try:
+            # Nothing is left to import into once the watched design closes
+            if watchState and args.document == watchState['document']:
+                adsk.core.Application.get().log('The watched design was closed, stopped watching the spreadsheet.')
+                stopWatching()
+                adsk.terminate()
+        except:
+            adsk.core.Application.get().log('Failed:\n{}'.format(traceback.format_exc()))
 
-        ui.messageBox('Parameters created successfully')
+class SheetChangedHandler(adsk.core.CustomEventHandler):
+    def __init__(self):
+        super().__init__()
+    def notify(self, args):
+        try:
+            reimportChangedParameters()
+        except:
+            adsk.core.Application.get().log('Failed:\n{}'.format(traceback.format_exc()))
+
+def startWatching(settings):
+    app = adsk.core.Application.get()
+    customEvent = app.registerCustomEvent(SHEET_CHANGED_EVENT_ID)
+    onSheetChanged = SheetChangedHandler()
+    customEvent.add(onSheetChanged)
+    handlers.append(onSheetChanged)
+    onDocumentClosing = DocumentClosingHandler()
+    app.documentClosing.add(onDocumentClosing)
+    handlers.append(onDocumentClosing)
+
+    watchState.update(settings)
+    watchState['stopFlag'] = threading.Event()
+    watchState['thread'] = threading.Thread(target=watchWorkbook, args=(settings['excelFile'], watchState['stopFlag']), daemon=True)
+    watchState['thread'].start()
+
+def stopWatching():
+    app = adsk.core.Application.get()
+    if 'stopFlag' in watchState:
+        watchState['stopFlag'].set()
+        watchState['thread'].join(WATCH_POLL_SECONDS * 2)
+        app.unregisterCustomEvent(SHEET_CHANGED_EVENT_ID)
+    for handler in handlers:
+        if isinstance(handler, DocumentClosingHandler):
+            app.documentClosing.remove(handler)
+    watchState.clear()
+    handlers.clear()
+
+def run(context):
+    ui = None
+    try:
+        app = adsk.core.Application.get()
+        ui = app.userInterface
+        settings = createParameters()
+        if not settings:
+            return
+
+        result = ui.messageBox('Keep watching this workbook and re-import parameters whenever it is saved?\n'
+                               'Stop the script from the Scripts and Add-Ins dialog to stop watching.',
+                               'Watch Spreadsheet', adsk.core.MessageBoxButtonTypes.YesNoButtonType)
+        if result == adsk.core.DialogResults.DialogYes:
+            startWatching(settings)
+            # Keep the script running after run returns so the event handler stays alive
+            adsk.autoTerminate(False)
 
     except:
         if ui:
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
-createParameters()
\ No newline at end of file
+def stop(context):
+    try:
+        stopWatching()
+    except:
+        adsk.core.Application.get().log('Failed:\n{}'.format(traceback.format_exc()))
\ No newline at end of file
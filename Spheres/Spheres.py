@@ -10,6 +10,12 @@ minRadius = 0.1
 maxPosition = 10.0
 minPosition = -10.0
 
+# Build all spheres as temporary BRep bodies and insert them in a single base
+# feature edit instead of a component + sketch + revolve per sphere
+useBRepFastPath = True
+# When using the fast path, put every sphere into one new component rather than the root
+singleComponent = True
+
 # Global set of event handlers to keep them referenced for the duration of the command
 handlers = []
 app = adsk.core.Application.get()
@@ -47,7 +53,7 @@ def createSphere(centerPoint, radius):
                                     adsk.core.Point3D.create(centerPoint.x + radius, centerPoint.y, centerPoint.z))
 
         # Trim the bottom half of the circle to create a semicircle
-        trimCurves = sketch.sketchCurves.sketchArcs
+        trimCurves = sketch.sketchCurves.sketchCircles
         for curve in trimCurves:
             if curve.centerSketchPoint.geometry.isEqualTo(centerPoint):
                 sketch.trim(curve, adsk.core.Point3D.create(centerPoint.x, centerPoint.y - radius, centerPoint.z))
@@ -70,6 +76,39 @@ def createSphere(centerPoint, radius):
         if ui:
             ui.messageBox('Failed to create the sphere.\n{}'.format(traceback.format_exc()))
 
+def createSpheresBRep(spheres):
+    try:
+        product = app.activeProduct
+        design = adsk.fusion.Design.cast(product)
+        if singleComponent:
+            targetComp = createNewComponent()
+        else:
+            targetComp = design.rootComponent
+
+        # Build every sphere in memory first, this doesn't touch the timeline
+        tempBRep = adsk.fusion.TemporaryBRepManager.get()
+        bodies = []
+        for centerPoint, radius in spheres:
+            bodies.append(tempBRep.createSphere(centerPoint, radius))
+
+        # Add all bodies inside one base feature so the timeline only gets a single entry.
+        # Base features are only available (and needed) in parametric designs.
+        if design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            baseFeature = targetComp.features.baseFeatures.add()
+            baseFeature.startEdit()
+            try:
+                for body in bodies:
+                    targetComp.bRepBodies.add(body, baseFeature)
+            finally:
+                baseFeature.finishEdit()
+        else:
+            for body in bodies:
+                targetComp.bRepBodies.add(body)
+
+    except:
+        if ui:
+            ui.messageBox('Failed to create the spheres.\n{}'.format(traceback.format_exc()))
+
 def spheresIntersect(center1, radius1, center2, radius2):
     distance = math.sqrt((center1.x - center2.x) ** 2 + (center1.y - center2.y) ** 2 + (center1.z - center2.z) ** 2)
     return distance < (radius1 + radius2)
@@ -93,7 +132,11 @@ def createRandomSpheres():
             
             if not intersects:
                 previousSpheres.append((centerPoint, radius))
-                createSphere(centerPoint, radius)
+                if not useBRepFastPath:
+                    createSphere(centerPoint, radius)
                 break
 
+    if useBRepFastPath:
+        createSpheresBRep(previousSpheres)
+
 createRandomSpheres()
\ No newline at end of file
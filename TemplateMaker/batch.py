@@ -0,0 +1,145 @@
+''' Makes templates from many DXF files in one session '''
+
+import adsk.core, adsk.cam, traceback
+import csv
+import os
+import time
+from . import script
+from . import toolpathCache
+
+# Optional list next to the DXFs with one row per file: file, thickness, name
+BATCH_LIST_FILENAME = 'batch.csv'
+# Written to the output folder at the end of a batch
+SUMMARY_FILENAME = 'template_summary.csv'
+# Close each document once its NC file is written so a long batch doesn't pile up documents
+CLOSE_DOCUMENTS = True
+
+
+def findDXFs(folder: str) -> list:
+    ''' Return the DXF files in folder, sorted by name '''
+    return sorted(os.path.join(folder, fileName) for fileName in os.listdir(folder)
+                  if fileName.lower().endswith('.dxf'))
+
+
+def readBatchList(folder: str, unitsManager: adsk.core.UnitsManager, defaultThickness: float) -> list:
+    ''' Return [(dxf file, thickness in cm, name)] for the DXFs in folder.
+
+    When the folder has a batch.csv, it lists the files to make and may give each one a
+    thickness (an expression like "0.25 in", plain numbers use the default length unit) and
+    an output name. Otherwise every DXF is made with the default thickness and its own name.
+    '''
+    listFile = os.path.join(folder, BATCH_LIST_FILENAME)
+    if not os.path.exists(listFile):
+        return [(dxfFile, defaultThickness, os.path.splitext(os.path.basename(dxfFile))[0]) for dxfFile in findDXFs(folder)]
+
+    entries = []
+    with open(listFile, 'r', newline='') as f:
+        for row in csv.reader(f):
+            row = [value.strip() for value in row]
+            if not row or not row[0] or row[0].lower() == 'file':
+                continue
+            dxfFile = os.path.join(folder, row[0])
+            thickness = defaultThickness
+            if len(row) > 1 and row[1]:
+                thickness = unitsManager.evaluateExpression(row[1], unitsManager.defaultLengthUnits)
+            name = row[2] if len(row) > 2 and row[2] else os.path.splitext(row[0])[0]
+            entries.append((dxfFile, thickness, name))
+    return entries
+
+
+def finishJob(job: script.TemplateJob, postConfig: adsk.cam.PostConfiguration, outputFolder: str,
+              progressDialog: adsk.core.ProgressDialog = None) -> bool:
+    ''' Wait for the job's toolpaths and write its NC file, returns False if the batch was cancelled first '''
+    job.doc.activate()
+    if not script.waitForToolpaths(job, progressDialog, False):
+        return False
+    written = script.postTemplate(job, postConfig, outputFolder, False)
+    if script.hasAllToolpaths(job):
+        toolpathCache.store(script.TOOLPATH_CACHE_DIR, job.cacheKey, written, job.dxfFile)
+    if CLOSE_DOCUMENTS:
+        job.doc.close(False)
+    return True
+
+
+def runBatch(entries: list, outputFolder: str, progressDialog: adsk.core.ProgressDialog = None, forceRegenerate: bool = False) -> list:
+    ''' Make a template from every (dxf file, thickness in cm, name) entry and post them all into outputFolder.
+
+    Every DXF is checked first and rejected without any Fusion work if it can't make a
+    template. Tools and the post configuration are looked up once. Each file is imported and set up while
+    the previous file's toolpaths generate in the background, and the previous file is posted
+    once they are done. Files whose NC program is in the toolpath cache are copied from there
+    unless forceRegenerate is set. Returns the summary rows, which are also written to SUMMARY_FILENAME.
+    '''
+    camManager = adsk.cam.CAMManager.get()
+    libraryManager: adsk.cam.CAMLibraryManager = camManager.libraryManager
+    tools = script.selectTools(libraryManager.toolLibraries)
+    missing = [role for role, tool in tools.items() if not tool]
+    if missing:
+        raise RuntimeError('No tool in the library matches: {}'.format(', '.join(missing)))
+    postConfig = script.importPostConfig(libraryManager.postLibrary)
+    settings = script.toolpathSettings(tools)
+
+    summary = []
+    pending = None
+
+    def finishPending():
+        job, row, started = pending
+        try:
+            row['status'] = 'ok' if finishJob(job, postConfig, outputFolder, progressDialog) else 'cancelled'
+        except:
+            row['status'] = 'failed'
+            row['message'] = traceback.format_exc().strip().splitlines()[-1]
+        row['seconds'] = round(time.perf_counter() - started, 1)
+
+    for number, (dxfFile, thickness, name) in enumerate(entries):
+        if progressDialog:
+            if progressDialog.wasCancelled:
+                break
+            progressDialog.progressValue = number
+        adsk.doEvents()
+
+        row = {'file': os.path.basename(dxfFile), 'name': name, 'thickness_in': round(thickness / 2.54, 4),
+               'status': '', 'seconds': 0, 'message': ''}
+        summary.append(row)
+        started = time.perf_counter()
+        try:
+            cacheKey = toolpathCache.fingerprint(dxfFile, thickness, settings)
+            cachedFiles = None if forceRegenerate else toolpathCache.lookup(script.TOOLPATH_CACHE_DIR, cacheKey)
+            if cachedFiles:
+                toolpathCache.restore(cachedFiles, outputFolder, name)
+                row['status'] = 'cached'
+                row['seconds'] = round(time.perf_counter() - started, 1)
+                continue
+            report = script.checkDXF(dxfFile)
+            if report['errors']:
+                row['status'] = 'rejected'
+                row['message'] = '; '.join(report['errors'])
+                row['seconds'] = round(time.perf_counter() - started, 1)
+                continue
+            row['message'] = '; '.join(report['warnings'])
+            job = script.startTemplate(dxfFile, thickness, name, tools)
+            if job:
+                job.cacheKey = cacheKey
+        except:
+            job = None
+            row['message'] = traceback.format_exc().strip().splitlines()[-1]
+        if not job:
+            row['status'] = 'failed'
+            row['message'] = row['message'] or 'No template bodies could be made from the DXF'
+            row['seconds'] = round(time.perf_counter() - started, 1)
+
+        # This file generates in the background while the previous one is posted
+        if pending:
+            finishPending()
+        pending = (job, row, started) if job else None
+
+    if pending:
+        finishPending()
+    if progressDialog:
+        progressDialog.progressValue = len(summary)
+
+    with open(os.path.join(outputFolder, SUMMARY_FILENAME), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['file', 'name', 'thickness_in', 'status', 'seconds', 'message'])
+        writer.writeheader()
+        writer.writerows(summary)
+    return summary
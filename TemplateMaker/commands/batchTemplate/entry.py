@@ -0,0 +1,172 @@
+import adsk.core
+import os
+import traceback
+from ...lib import fusionAddInUtils as futil
+from ... import config
+from ... import batch
+from ... import script
+app = adsk.core.Application.get()
+ui = app.userInterface
+
+
+CMD_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_batchTemplate'
+CMD_NAME = 'Batch Templates'
+CMD_Description = 'Make templates from a folder or a list of DXF files and post them all in one run'
+
+# Specify that the command will be promoted to the panel.
+IS_PROMOTED = False
+
+# This is done by specifying the workspace, the tab, and the panel, and the
+# command it will be inserted beside. Not providing the command to position it
+# will insert it at the end.
+WORKSPACE_ID = 'FusionSolidEnvironment'
+PANEL_ID = 'SolidScriptsAddinsPanel'
+COMMAND_BESIDE_ID = 'ScriptsManagerCommand'
+
+# Resource location for command icons, here we assume a sub folder in this directory named "resources".
+ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '')
+
+# Where the DXF files come from
+SOURCE_FOLDER = 'Folder of DXF files'
+SOURCE_FILES = 'Selected DXF files'
+
+# Local list of event handlers used to maintain a reference so
+# they are not released and garbage collected.
+local_handlers = []
+
+
+# Executed when add-in is run.
+def start():
+    # Create a command Definition.
+    cmd_def = ui.commandDefinitions.addButtonDefinition(CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER)
+
+    # Define an event handler for the command created event. It will be called when the button is clicked.
+    futil.add_handler(cmd_def.commandCreated, command_created)
+
+    # ******** Add a button into the UI so the user can run the command. ********
+    # Get the target workspace the button will be created in.
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+
+    # Get the panel the button will be created in.
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+
+    # Create the button command control in the UI after the specified existing command.
+    control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
+
+    # Specify if the command is promoted to the main toolbar.
+    control.isPromoted = IS_PROMOTED
+
+
+# Executed when add-in is stopped.
+def stop():
+    # Get the various UI elements for this command
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    command_control = panel.controls.itemById(CMD_ID)
+    command_definition = ui.commandDefinitions.itemById(CMD_ID)
+
+    # Delete the button command control
+    if command_control:
+        command_control.deleteMe()
+
+    # Delete the command definition
+    if command_definition:
+        command_definition.deleteMe()
+
+
+# Function that is called when a user clicks the corresponding button in the UI.
+# This defines the contents of the command dialog and connects to the command related events.
+def command_created(args: adsk.core.CommandCreatedEventArgs):
+    # General logging for debug.
+    futil.log(f'{CMD_NAME} Command Created Event')
+
+    inputs = args.command.commandInputs
+
+    # Pick a whole folder (with an optional batch.csv) or individual files
+    source_input = inputs.addDropDownCommandInput('source_input', 'DXF files', adsk.core.DropDownStyles.TextListDropDownStyle)
+    source_input.listItems.add(SOURCE_FOLDER, True)
+    source_input.listItems.add(SOURCE_FILES, False)
+
+    # Thickness for files that batch.csv doesn't give one
+    defaultLengthUnits = app.activeProduct.unitsManager.defaultLengthUnits
+    default_value = adsk.core.ValueInput.createByString('0.2')
+    inputs.addValueInput('value_input', 'Default thickness', defaultLengthUnits, default_value)
+
+    # Skip the toolpath cache and generate everything again
+    inputs.addBoolValueInput('force_input', 'Force regenerate', True, '', False)
+
+    futil.add_handler(args.command.execute, command_execute, local_handlers=local_handlers)
+    futil.add_handler(args.command.validateInputs, command_validate_input, local_handlers=local_handlers)
+    futil.add_handler(args.command.destroy, command_destroy, local_handlers=local_handlers)
+
+
+# This event handler is called when the user clicks the OK button in the command dialog or
+# is immediately called after the created event not command inputs were created for the dialog.
+def command_execute(args: adsk.core.CommandEventArgs):
+    # General logging for debug.
+    futil.log(f'{CMD_NAME} Command Execute Event')
+
+    inputs = args.command.commandInputs
+    source_input: adsk.core.DropDownCommandInput = inputs.itemById('source_input')
+    value_input: adsk.core.ValueCommandInput = inputs.itemById('value_input')
+    force_input: adsk.core.BoolValueCommandInput = inputs.itemById('force_input')
+    thickness = value_input.value
+
+    try:
+        if source_input.selectedItem.name == SOURCE_FOLDER:
+            folder_dialog = ui.createFolderDialog()
+            folder_dialog.title = 'Select folder of DXF files'
+            if folder_dialog.showDialog() != adsk.core.DialogResults.DialogOK:
+                return
+            entries = batch.readBatchList(folder_dialog.folder, app.activeProduct.unitsManager, thickness)
+        else:
+            file_dialog = ui.createFileDialog()
+            file_dialog.isMultiSelectEnabled = True
+            file_dialog.title = 'Select DXF files'
+            file_dialog.filter = 'DXF files (*.dxf)'
+            if file_dialog.showOpen() != adsk.core.DialogResults.DialogOK:
+                return
+            entries = [(dxf_file, thickness, os.path.splitext(os.path.basename(dxf_file))[0]) for dxf_file in file_dialog.filenames]
+
+        if not entries:
+            ui.messageBox('No DXF files found.')
+            return
+
+        output_folder = script.askForOutputFolder(ui, 'Select output folder for the NC programs')
+        if not output_folder:
+            return
+
+        progress_dialog = ui.createProgressDialog()
+        progress_dialog.isCancelButtonShown = True
+        progress_dialog.show('Making templates...', '%v of %m files', 0, len(entries))
+        try:
+            summary = batch.runBatch(entries, output_folder, progress_dialog, force_input.value)
+        finally:
+            progress_dialog.hide()
+
+        posted = sum(1 for row in summary if row['status'] in ('ok', 'cached'))
+        failed = [row for row in summary if row['status'] in ('failed', 'rejected')]
+        msg = f'Posted {posted} of {len(entries)} templates to {output_folder}'
+        if failed:
+            msg += '\nFailed: ' + ', '.join(f'{row["file"]} ({row["message"]})' for row in failed)
+        msg += f'\nSee {batch.SUMMARY_FILENAME} for details.'
+        ui.messageBox(msg)
+    except:
+        ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+
+# This event handler is called when the user interacts with any of the inputs in the dialog
+# which allows you to verify that all of the inputs are valid and enables the OK button.
+def command_validate_input(args: adsk.core.ValidateInputsEventArgs):
+    inputs = args.inputs
+    valueInput = inputs.itemById('value_input')
+    args.areInputsValid = valueInput.value > 0
+
+
+# This event handler is called when the command terminates.
+def command_destroy(args: adsk.core.CommandEventArgs):
+    # General logging for debug.
+    futil.log(f'{CMD_NAME} Command Destroy Event')
+
+    global local_handlers
+    local_handlers = []
@@ -89,6 +89,9 @@ def command_created(args: adsk.core.CommandCreatedEventArgs):
     default_value = adsk.core.ValueInput.createByString('0.2')
     inputs.addValueInput('value_input', 'Thickness', defaultLengthUnits, default_value)
 
+    # Skip the toolpath cache and generate everything again
+    inputs.addBoolValueInput('force_input', 'Force regenerate', True, '', False)
+
     # TODO Connect to the events that are needed by this command.
     futil.add_handler(args.command.execute, command_execute, local_handlers=local_handlers)
     futil.add_handler(args.command.inputChanged, command_input_changed, local_handlers=local_handlers)
@@ -109,12 +112,13 @@ def command_execute(args: adsk.core.CommandEventArgs):
     inputs = args.command.commandInputs
     text_box: adsk.core.TextBoxCommandInput = inputs.itemById('text_box')
     value_input: adsk.core.ValueCommandInput = inputs.itemById('value_input')
+    force_input: adsk.core.BoolValueCommandInput = inputs.itemById('force_input')
 
     # Do something interesting
     text = text_box.text
     expression = value_input.value
     msg = f'Your text: {text}<br>Your value: {expression}'
-    script.run(expression, text)
+    script.run(expression, text, force_input.value)
 
 
 # This event handler is called when the command needs to compute a new preview in the graphics window.
@@ -0,0 +1,342 @@
+''' Streaming check of an ASCII DXF before anything is imported into Fusion
+
+The file is read one group code/value pair at a time and only the entities section is looked
+at, so no document is ever built. For every layer it counts entities by type, finds the
+extents and checks that the geometry forms closed loops. Circles on the outline layer are
+collected as hole diameters. Results are cached by the hash of the file.
+'''
+
+import hashlib
+import json
+import math
+import os
+
+# Bump when the checks change so cached reports are redone
+CHECK_VERSION = 2
+# Cached reports kept, the oldest are dropped first
+MAX_CACHED_REPORTS = 500
+# Endpoints closer than this (drawing units) are treated as joined
+JOIN_TOLERANCE = 1e-4
+
+# $INSUNITS codes of the units a template is likely drawn in, and their size in mm
+UNITS = {1: ('in', 25.4), 2: ('ft', 304.8), 4: ('mm', 1.0), 5: ('cm', 10.0), 6: ('m', 1000.0)}
+UNIT_SIZES = {name: size for name, size in UNITS.values()}
+
+# Entities that don't describe any cutting geometry
+IGNORED_TYPES = {'TEXT', 'MTEXT', 'DIMENSION', 'POINT', 'HATCH', 'LEADER', 'MULTILEADER', 'VIEWPORT', 'ATTDEF', 'ATTRIB'}
+
+
+class DXFError(Exception):
+    ''' Raised when a file isn't an ASCII DXF that can be read '''
+
+
+def fileHash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def readPairs(f):
+    ''' Yield (group code, value) pairs from an open DXF file '''
+    lineNumber = 0
+    while True:
+        code = f.readline()
+        value = f.readline()
+        lineNumber += 2
+        if not code:
+            return
+        try:
+            yield int(code), value.strip()
+        except ValueError:
+            raise DXFError(f'Line {lineNumber - 1}: "{code.strip()[:20]}" is not a group code, the file may be binary or damaged')
+
+
+def readEntities(path: str):
+    ''' Return ($INSUNITS code, iterator of entity dicts) for the entities section.
+
+    An entity dict has 'type', 'layer', 'codes' (the last value of every single valued group
+    code) and 'points' (every 10/20 pair in order). Old style POLYLINE entities get their
+    VERTEX points and are yielded when their SEQEND is reached.
+    '''
+    f = open(path, 'r', encoding='utf-8', errors='replace')
+    if f.readline().startswith('AutoCAD Binary DXF'):
+        f.close()
+        raise DXFError('Binary DXF files are not supported, save it as an ASCII DXF')
+    f.seek(0)
+
+    pairs = readPairs(f)
+    units = 0
+
+    # Skip to the entities section, reading $INSUNITS on the way
+    variable = None
+    for code, value in pairs:
+        if code == 9:
+            variable = value
+        elif code == 70 and variable == '$INSUNITS':
+            units = int(value)
+            variable = None
+        elif code == 2 and value == 'ENTITIES':
+            break
+    else:
+        f.close()
+        raise DXFError('The file has no ENTITIES section')
+
+    def entities():
+        try:
+            entity = None
+            polyline = None
+            for code, value in pairs:
+                if code == 0:
+                    if entity:
+                        if entity['type'] == 'POLYLINE':
+                            # The point of the POLYLINE itself only holds the elevation
+                            entity['points'] = []
+                            polyline = entity
+                        elif entity['type'] == 'VERTEX' and polyline:
+                            polyline['points'].extend(entity['points'])
+                        elif entity['type'] != 'SEQEND':
+                            yield entity
+                    if value == 'SEQEND' and polyline:
+                        yield polyline
+                        polyline = None
+                    if value == 'ENDSEC':
+                        return
+                    entity = {'type': value, 'layer': '0', 'codes': {}, 'points': []}
+                elif entity is None:
+                    continue
+                elif code == 8:
+                    entity['layer'] = value
+                elif code == 10:
+                    entity['points'].append([float(value), 0.0])
+                elif code == 20 and entity['points']:
+                    entity['points'][-1][1] = float(value)
+                else:
+                    entity['codes'][code] = value
+        finally:
+            f.close()
+
+    return units, entities()
+
+
+def arcPoint(cx, cy, radius, degrees):
+    angle = math.radians(degrees)
+    return cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+
+
+def arcExtents(cx, cy, radius, start, end):
+    ''' Points bounding an arc: its ends and any quadrant points it sweeps through '''
+    sweep = (end - start) % 360 or 360
+    points = [arcPoint(cx, cy, radius, start), arcPoint(cx, cy, radius, end)]
+    for quadrant in (0, 90, 180, 270):
+        if (quadrant - start) % 360 <= sweep:
+            points.append(arcPoint(cx, cy, radius, quadrant))
+    return points
+
+
+def entityGeometry(entity):
+    ''' Return (points for the extents, end points or None if the entity is closed) '''
+    kind = entity['type']
+    codes = entity['codes']
+    points = [tuple(point) for point in entity['points']]
+
+    if kind == 'CIRCLE':
+        (cx, cy), radius = points[0], float(codes.get(40, 0))
+        return [(cx - radius, cy - radius), (cx + radius, cy + radius)], None
+    if kind == 'ARC':
+        (cx, cy), radius = points[0], float(codes.get(40, 0))
+        start, end = float(codes.get(50, 0)), float(codes.get(51, 0))
+        return arcExtents(cx, cy, radius, start, end), [arcPoint(cx, cy, radius, start), arcPoint(cx, cy, radius, end)]
+    if kind == 'LINE':
+        end = (float(codes.get(11, 0)), float(codes.get(21, 0)))
+        return points + [end], [points[0], end]
+    if kind == 'ELLIPSE':
+        (cx, cy) = points[0]
+        major = math.hypot(float(codes.get(11, 0)), float(codes.get(21, 0)))
+        extents = [(cx - major, cy - major), (cx + major, cy + major)]
+        start, end = float(codes.get(41, 0)), float(codes.get(42, 2 * math.pi))
+        if abs((end - start) - 2 * math.pi) < 1e-9:
+            return extents, None
+        # The ends of a partial ellipse aren't worked out, it isn't counted as closed or as open
+        return extents, []
+    if kind in ('LWPOLYLINE', 'POLYLINE', 'SPLINE'):
+        # Splines are closed or periodic with flag 1 or 2, polylines are closed with flag 1
+        closed = int(codes.get(70, 0)) & (1 if kind != 'SPLINE' else 3)
+        if closed or len(points) < 2:
+            return points, None
+        return points, [points[0], points[-1]]
+    return points, []
+
+
+def countOpenEnds(ends, tolerance=JOIN_TOLERANCE):
+    ''' Pair up end points closer than tolerance and return how many are left over.
+
+    Points are bucketed in cells one tolerance wide and each one is compared with the points in
+    its own and the 8 neighbouring cells, so ends on either side of a cell boundary still join.
+    '''
+    cells = {}
+    for index, (x, y) in enumerate(ends):
+        cells.setdefault((math.floor(x / tolerance), math.floor(y / tolerance)), []).append(index)
+
+    joined = [False] * len(ends)
+    limit = tolerance * tolerance
+    for index, (x, y) in enumerate(ends):
+        if joined[index]:
+            continue
+        cx, cy = math.floor(x / tolerance), math.floor(y / tolerance)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other in cells.get((cx + dx, cy + dy), ()):
+                    if other != index and not joined[other]:
+                        ox, oy = ends[other]
+                        if (ox - x) ** 2 + (oy - y) ** 2 <= limit:
+                            joined[index] = joined[other] = True
+                            break
+                if joined[index]:
+                    break
+            if joined[index]:
+                break
+    return joined.count(False)
+
+
+class LayerStats:
+    ''' Counts, extents and loop ends of the entities on one layer '''
+
+    def __init__(self):
+        self.counts = {}
+        self.extents = None
+        self.closedCurves = 0
+        self.ends = []
+        self.circles = []
+
+    def add(self, entity):
+        kind = entity['type']
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if kind in IGNORED_TYPES or not entity['points']:
+            return
+
+        points, ends = entityGeometry(entity)
+        for x, y in points:
+            if self.extents is None:
+                self.extents = [x, y, x, y]
+            else:
+                self.extents = [min(self.extents[0], x), min(self.extents[1], y),
+                                max(self.extents[2], x), max(self.extents[3], y)]
+        if kind == 'CIRCLE':
+            self.circles.append(2 * float(entity['codes'].get(40, 0)))
+        if ends is None:
+            self.closedCurves += 1
+        self.ends.extend(ends or [])
+
+    def openEnds(self):
+        ''' Number of end points that aren't joined to another end within JOIN_TOLERANCE '''
+        return countOpenEnds(self.ends)
+
+    def report(self):
+        return {'counts': self.counts, 'extents': self.extents, 'closedCurves': self.closedCurves, 'openEnds': self.openEnds()}
+
+
+def checkFile(path: str, outlineLayer: str = '0', scribeLayer: str = 'Scribe', scribeRequired: bool = True,
+              defaultUnits: str = 'in', maxHoleDiameterMM: float = None, cachePath: str = None) -> dict:
+    ''' Check a DXF and return a report dict with 'errors' and 'warnings' lists.
+
+    Errors mean the file can't make a template: it can't be read, the outline layer is
+    missing or empty, its outline doesn't close, or the scribe layer is missing while
+    scribeRequired is set. The report also has 'units', per layer 'layers' and the outline
+    layer's 'holeDiameters' as {diameter: count} in drawing units.
+    '''
+    settings = [CHECK_VERSION, outlineLayer, scribeLayer, scribeRequired, defaultUnits, maxHoleDiameterMM, JOIN_TOLERANCE]
+    key = fileHash(path) + hashlib.sha1(json.dumps(settings).encode('utf-8')).hexdigest()[:12]
+    cache = loadCache(cachePath)
+    if key in cache:
+        return cache[key]
+
+    report = {'file': os.path.basename(path), 'units': defaultUnits, 'layers': {}, 'holeDiameters': {}, 'errors': [], 'warnings': []}
+    try:
+        units, entities = readEntities(path)
+        if units in UNITS:
+            report['units'] = UNITS[units][0]
+        layers: dict[str, LayerStats] = {}
+        for entity in entities:
+            layers.setdefault(entity['layer'], LayerStats()).add(entity)
+    except (DXFError, ValueError, IndexError) as e:
+        report['errors'].append(f'Could not read the DXF: {e}')
+        layers = {}
+    except OSError as e:
+        report['errors'].append(f'Could not open the DXF: {e}')
+        return report
+
+    report['layers'] = {name: stats.report() for name, stats in layers.items()}
+
+    outline = layers.get(outlineLayer)
+    if not report['errors']:
+        if not outline or outline.extents is None:
+            report['errors'].append(f'Layer "{outlineLayer}" has no outline or holes')
+        elif report['layers'][outlineLayer]['openEnds']:
+            report['errors'].append(f'Layer "{outlineLayer}" has {report["layers"][outlineLayer]["openEnds"]} open ends, every outline and hole must be a closed loop')
+        if scribeLayer not in layers:
+            message = f'Layer "{scribeLayer}" is missing'
+            if scribeRequired:
+                report['errors'].append(message)
+            else:
+                report['warnings'].append(message + ', the scribe operation is skipped')
+        for name, stats in layers.items():
+            if stats.counts.get('INSERT') and name in (outlineLayer, scribeLayer):
+                report['warnings'].append(f'Layer "{name}" has block references, their contents are not checked')
+
+    if outline:
+        # A round template's outline is a circle too, it spans the whole layer
+        width = outline.extents[2] - outline.extents[0] if outline.extents else 0
+        for diameter in outline.circles:
+            if abs(diameter - width) > JOIN_TOLERANCE:
+                rounded = round(diameter, 4)
+                report['holeDiameters'][rounded] = report['holeDiameters'].get(rounded, 0) + 1
+        unitSize = UNIT_SIZES.get(report['units'])
+        if maxHoleDiameterMM and unitSize:
+            tooLarge = sorted(d for d in report['holeDiameters'] if d * unitSize > maxHoleDiameterMM)
+            if tooLarge:
+                report['warnings'].append('Holes larger than the bore operation allows ({} mm) are not bored: {} {}'.format(
+                    maxHoleDiameterMM, ', '.join(str(d) for d in tooLarge), report['units']))
+
+    # JSON keys are strings, keep the report the same whether it came from the cache or not
+    report['holeDiameters'] = {str(d): count for d, count in sorted(report['holeDiameters'].items())}
+    cache[key] = report
+    saveCache(cachePath, cache)
+    return report
+
+
+def loadCache(cachePath: str) -> dict:
+    if not cachePath:
+        return {}
+    try:
+        with open(cachePath, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def saveCache(cachePath: str, cache: dict):
+    if not cachePath:
+        return
+    # Dicts keep insertion order, so the first entries are the oldest
+    while len(cache) > MAX_CACHED_REPORTS:
+        del cache[next(iter(cache))]
+    try:
+        tempPath = cachePath + '.tmp'
+        with open(tempPath, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tempPath, cachePath)
+    except OSError:
+        pass
+
+
+def toMillimeters(expression: str) -> float:
+    ''' Convert a simple length expression like "20 mm" or "0.5 in" to mm, None if it isn't one '''
+    parts = str(expression).split()
+    try:
+        value = float(parts[0])
+    except (IndexError, ValueError):
+        return None
+    unit = parts[1] if len(parts) > 1 else 'mm'
+    return value * UNIT_SIZES[unit] if unit in UNIT_SIZES else None
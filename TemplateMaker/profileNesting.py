@@ -0,0 +1,65 @@
+''' Nesting of sketch profiles from their bounding boxes, without any Fusion API calls '''
+
+import heapq
+
+# Bounding boxes closer than this (cm) are treated as touching, DXF coordinates are noisy
+TOLERANCE = 1e-6
+
+
+def containsBox(outer, inner, tolerance=TOLERANCE):
+    ''' True when box inner (minX, minY, maxX, maxY) lies inside box outer '''
+    return (inner[0] >= outer[0] - tolerance and
+        inner[1] >= outer[1] - tolerance and
+        inner[2] <= outer[2] + tolerance and
+        inner[3] <= outer[3] + tolerance)
+
+
+def boxArea(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def nestingDepths(boxes, tolerance=TOLERANCE):
+    ''' Return (depths, parents) for a list of (minX, minY, maxX, maxY) boxes.
+
+    The depth of a box is the number of boxes around it: 0 for outer loops, 1 for holes,
+    2 for islands inside holes and so on. The parent is the index of the tightest box around
+    it, or None. Boxes are swept in order of minX, so only boxes still open at that x are
+    compared instead of every pair.
+    '''
+    count = len(boxes)
+    depths = [0] * count
+    parents = [None] * count
+
+    # Larger boxes first on ties so a parent is always seen before its children
+    order = sorted(range(count), key=lambda i: (boxes[i][0], -boxArea(boxes[i])))
+
+    active = {}
+    closing = []
+    for index in order:
+        box = boxes[index]
+
+        # Drop the boxes that end before this one starts
+        while closing and closing[0][0] < box[0] - tolerance:
+            _, done = heapq.heappop(closing)
+            del active[done]
+
+        parent = None
+        for other, otherBox in active.items():
+            if containsBox(otherBox, box, tolerance):
+                if parent is None or boxArea(otherBox) < boxArea(boxes[parent]):
+                    parent = other
+
+        if parent is not None:
+            parents[index] = parent
+            depths[index] = depths[parent] + 1
+
+        active[index] = box
+        heapq.heappush(closing, (box[2], index))
+
+    return depths, parents
+
+
+def solidIndices(boxes, tolerance=TOLERANCE):
+    ''' Return the indices of the boxes that are material: outer loops and islands inside holes '''
+    depths, _ = nestingDepths(boxes, tolerance)
+    return [index for index, depth in enumerate(depths) if depth % 2 == 0]
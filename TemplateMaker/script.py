@@ -1,12 +1,91 @@
 import adsk.core, adsk.fusion, adsk.cam, traceback
+import csv
 import os
+import time
 from enum import Enum
+from . import profileNesting
+from . import toolIndex
+from . import toolpathCache
+from . import dxfCheck
 
 
 #################### Some constants used in the script ####################
 
 # Milling tool library to get tools from
 MILLING_TOOL_LIBRARY = 'Milling Tools (Metric)'
+TOOL_LIBRARY_URL = 'systemlibraryroot://Samples/Milling Tools (Inch).json'
+
+# Index of the tool library by type and diameter, rebuilt when the library changes
+TOOL_INDEX_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tool_index.json')
+
+# Tools used by the operations: tool type, diameter range in inches (min inclusive, max exclusive)
+# and the tool number to give it. Tools are picked as the library is walked in order, see ToolIndex.select.
+TOOL_CHOICES = {
+    'liner': {'type': 'spot drill', 'minDiameter': None, 'maxDiameter': None, 'number': 7},
+    'bore': {'type': 'flat end mill', 'minDiameter': 0.125, 'maxDiameter': 0.13, 'number': 4},
+    'finishing': {'type': 'flat end mill', 'minDiameter': 0.2, 'maxDiameter': 0.26, 'number': 3}
+}
+
+# Stock and work origin of the setup, expressions by parameter name
+SETUP_PARAMETERS = {
+    'job_stockOffsetMode': "'simple'",
+    'job_stockOffsetSides': '12.6 mm',
+    'job_stockOffsetTop': '0 mm'
+}
+
+# Expressions of each operation's parameters by name, set in this order
+OPERATION_PARAMETERS = {
+    'scribe': {
+        'axialOffset': '-1.5 mm',
+        'tool_spindleSpeed': '15000 rpm',
+        'tool_feedCutting': '5000 mm/min'
+    },
+    'bore': {
+        'stockToLeave': '-0.1 mm',
+        'holeMode': "'diameter'",
+        'holeDiameterMinimum': '1 mm',
+        'holeDiameterMaximum': '20 mm',
+        'tool_spindleSpeed': '13000 rpm',
+        'tool_feedCutting': '5000 mm/min',
+        'plungeAngle': '8'
+    },
+    'cutout': {
+        'bottomHeight_offset': '-0.00204 in',
+        'maximumStepdown': '0.1 in',
+        'tool_spindleSpeed': '12000 rpm',
+        'tool_feedCutting': '5000 mm/min'
+    }
+}
+
+# Post processor and its parameters
+POST_CONFIG_DESCRIPTION = 'Custom Thermwood 3-Axis'
+# Source of that post in this repo, hashed so an edit to it invalidates cached NC programs
+POST_PROCESSOR_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PostProcessor', 'CustomThermwoodPostProcessor.js')
+POST_PARAMETERS = {
+    'builtin_tolerance': 0.01,
+    'builtin_minimumChordLength': 0.33
+}
+
+# Posted NC programs are kept here and reused when the DXF, thickness, tools and all of the
+# parameters above are unchanged
+TOOLPATH_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'toolpath_cache')
+
+# DXF layers: outlines and holes, and the lines to scribe. The sketches Fusion makes from the
+# DXF are named after the layers.
+OUTLINE_LAYER = '0'
+SCRIBE_LAYER = 'Scribe'
+# Reject DXFs without scribe lines, otherwise the scribe operation is left out
+SCRIBE_REQUIRED = True
+# Units of DXFs that don't say
+DXF_DEFAULT_UNITS = 'in'
+# DXF checks are kept here by file hash
+DXF_CHECK_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dxf_check_cache.json')
+
+# Waiting for toolpaths: seconds between checks and between progress bar updates
+GENERATION_POLL_INTERVAL = 0.05
+PROGRESS_UPDATE_INTERVAL = 0.25
+# Generation time of every operation is appended here
+GENERATION_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generation_times.csv')
 
 # Some material properties for feed and speed calculation
 WOOD_CUTTING_SPEED = 508  # mm/min
@@ -57,257 +136,437 @@ class SetupWCSPoint(Enum):
 
 #main function
 
-def run(thickness: float, name: str):
+def run(thickness: float, name: str, forceRegenerate: bool = False):
     ui = None
     try:
 
         #################### initialisation #####################
         app = adsk.core.Application.get()
         ui  = app.userInterface
-        
-        # create a new empty document
-        doc: adsk.core.Document = app.documents.add(adsk.core.DocumentTypes.FusionDesignDocumentType)
-
-        # get the design document used to create the sample part
-        design = app.activeProduct
-
-        # switch to manufacturing space
-        camWS = ui.workspaces.itemById('CAMEnvironment') 
-        camWS.activate()
-
-        # get the CAM product
-        products = doc.products
-
-        #################### create template bodies ####################
-        
-        models = createBodies(design, thickness)
 
+        # ask for the DXF file to make the template from
+        dxfFile = askForDXF(ui)
+        if not dxfFile:
+            return
 
         #################### select cutting tools ####################
 
-        # get the tool libraries from the library manager
         camManager = adsk.cam.CAMManager.get()
         libraryManager: adsk.cam.CAMLibraryManager = camManager.libraryManager
-        toolLibraries: adsk.cam.ToolLibraries = libraryManager.toolLibraries
-
-        libUrl = 'systemlibraryroot://Samples/Milling Tools (Inch).json'
-        url = adsk.core.URL.create(libUrl)
-
-        # load tool library
-        toolLibrary = toolLibraries.toolLibraryAtURL(url)
+        tools = selectTools(libraryManager.toolLibraries)
+        missing = [role for role, tool in tools.items() if not tool]
+        if missing:
+            ui.messageBox('No tool in the library matches: {}'.format(', '.join(missing)))
+            return
 
-        # create some variables to host the milling tools which will be used in the operations
-        linerTool = None
-        boreTool = None
-        finishingTool = None
-        
-        # searchig the face mill and the bull nose using a loop for the roughing operations
-        for tool in toolLibrary:
-            # read the tool type
-            diameter = tool.parameters.itemByName('tool_diameter').value.value /2.54
-            toolType = tool.parameters.itemByName('tool_type').value.value
-            
-            if toolType == "flat end mill" and diameter >= 0.2 and diameter < 0.26:
-                finishingTool = tool
-                finishingTool.parameters.itemByName('tool_number').value.value = 3
-            
-            # search the roughing tool
-            if toolType == "spot drill":
-                linerTool = tool
-                linerTool.parameters.itemByName('tool_number').value.value = 7
-
-            # search the boring tool
-            if toolType == "flat end mill" and diameter >= 0.125 and diameter < 0.13:
-                boreTool = tool 
-                boreTool.parameters.itemByName('tool_number').value.value = 4
-
-            # exit when the 2 tools are found
-            if finishingTool and linerTool and boreTool:
-                break
+        #################### reuse a cached NC program ####################
 
+        cacheKey = toolpathCache.fingerprint(dxfFile, thickness, toolpathSettings(tools))
+        cachedFiles = None if forceRegenerate else toolpathCache.lookup(TOOLPATH_CACHE_DIR, cacheKey)
+        if cachedFiles:
+            outputFolder = askForOutputFolder(ui, 'Select output folder for NC program')
+            if outputFolder:
+                written = toolpathCache.restore(cachedFiles, outputFolder, name)
+                ui.messageBox('Nothing changed since this DXF was last posted, the cached NC program was reused:\n{}'.format('\n'.join(written)))
+            return
 
-        #################### create setup ####################
-        cam = adsk.cam.CAM.cast(products.itemByProductType("CAMProductType"))
-        setups = cam.setups
-        setupInput = setups.createInput(adsk.cam.OperationTypes.MillingOperation)
-        setupInput.models = models
-
-        # configure properties
-        setup = setups.add(setupInput)
-        setup.name = 'Preset Template Setup'
-        setup.stockMode = adsk.cam.SetupStockModes.RelativeBoxStock
-        # set offset mode
-        setup.parameters.itemByName('job_stockOffsetMode').expression = "'simple'"
-        # set offset stock side
-        setup.parameters.itemByName('job_stockOffsetSides').expression = '12.6 mm'
-        # set offset stock top
-        setup.parameters.itemByName('job_stockOffsetTop').expression = '0 mm'
-        # set setup origin
-        setup.parameters.itemByName('wcs_origin_boxPoint').value.value = SetupWCSPoint.BOTTOM_XMAX_YMAX.value
-
-
-        #################### scribe operation ####################
-        #Find the sketch named "Scribe"
-        scribe_sketch = None
-        for sketch in design.rootComponent.sketches:
-            if sketch.name == "Scribe":
-                scribe_sketch = sketch
-                break
-        if not scribe_sketch:
-            ui.messageBox('Sketch "Scribe" not found.')
+        #################### check the DXF ####################
 
-        # create the scribe operation input
-        input: adsk.cam.OperationInput = setup.operations.createInput('trace')
-        input.displayName = 'scribe'
-        input.tool = linerTool
-        input.parameters.itemByName('axialOffset').expression = '-1.5 mm'
+        report = checkDXF(dxfFile)
+        if report['errors']:
+            ui.messageBox('This DXF can\'t be made into a template:\n{}'.format('\n'.join(report['errors'])), 'DXF Check')
+            return
+        if report['warnings']:
+            result = ui.messageBox('{}\n\nContinue anyway?'.format('\n'.join(report['warnings'])), 'DXF Check',
+                                   adsk.core.MessageBoxButtonTypes.OKCancelButtonType, adsk.core.MessageBoxIconTypes.WarningIconType)
+            if result != adsk.core.DialogResults.DialogOK:
+                return
 
-        # Apply the sketch to the operation input
-        pocketSelection: adsk.cam.CadContours2dParameterValue = input.parameters.itemByName('curves').value
-        chains: adsk.cam.CurveSelections = pocketSelection.getCurveSelections()
-        chain: adsk.cam.SketchSelection = chains.createNewSketchSelection()
-        chain.inputGeometry = [sketch]
-        chain.loopType = adsk.cam.LoopTypes.OnlyOutsideLoops
-        chain.sideType = adsk.cam.SideTypes.AlwaysInsideSideType
-        pocketSelection.applyCurveSelections(chains)
-        input.parameters.itemByName('tool_spindleSpeed').expression = '15000 rpm'
-        input.parameters.itemByName('tool_feedCutting').expression = '5000 mm/min'
+        #################### create the template and start generating ####################
 
-        # Add to the setup
-        op: adsk.cam.OperationBase = setup.operations.add(input)   
-        scribeOP = op
-
-        #################### bore operation ####################
-        # create the bore operation input
-        input = setup.operations.createInput('bore')
-        input.tool = boreTool
-        input.displayName = 'bore'
-        input.parameters.itemByName('useStockToLeave').value.value = True
-        input.parameters.itemByName('stockToLeave').expression = '-0.1 mm'
-        input.parameters.itemByName('holeMode').expression = "'diameter'" 
-        input.parameters.itemByName('holeDiameterMinimum').expression = '1 mm'  # Minimum diameter  
-        input.parameters.itemByName('holeDiameterMaximum').expression = '20 mm'  # Maximum diameter
-        input.parameters.itemByName('tool_spindleSpeed').expression = '13000 rpm'
-        input.parameters.itemByName('tool_feedCutting').expression = '5000 mm/min'
-        input.parameters.itemByName('useAngle').value.value = True
-        input.parameters.itemByName('plungeAngle').expression = '8'
-        chain: adsk.cam.SketchSelection = chains.createNewSketchSelection()
-        op: adsk.cam.OperationBase = setup.operations.add(input)   
-        boreOP = op
-
-        #################### finish operation ####################
-        # create the finish operation input
-        input = setup.operations.createInput('contour2d')
-        input.tool = finishingTool
-        input.displayName = 'cutout'
-        input.parameters.itemByName('bottomHeight_offset').expression = '-0.00204 in'
-        input.parameters.itemByName('doMultipleDepths').value.value = True
-        input.parameters.itemByName('maximumStepdown').expression = '0.1 in'
-        input.parameters.itemByName('tool_spindleSpeed').expression = '12000 rpm'
-        input.parameters.itemByName('tool_feedCutting').expression = '5000 mm/min'
-        finalOp = setup.operations.add(input)
-
-        # Add silhouette selection to the geometries of finalOp
-        cadcontours2dParam: adsk.cam.CadContours2dParameterValue = finalOp.parameters.itemByName('contours').value
-        chains = cadcontours2dParam.getCurveSelections()
-        chains.createNewSilhouetteSelection()
-        cadcontours2dParam.applyCurveSelections(chains)
+        job = startTemplate(dxfFile, thickness, name, tools)
+        if not job:
+            return
 
         #################### generate operations ####################
-        # add the valid operations to generate
-        operations = adsk.core.ObjectCollection.create()
-        operations.add(scribeOP)
-        operations.add(boreOP)
-        operations.add(finalOp)
 
         # create progress bar
         progressDialog = ui.createProgressDialog()
-        progressDialog.isCancelButtonShown = False
+        progressDialog.isCancelButtonShown = True
         progressDialog.show('Generating operations...', '%p%', 0, 100)
         adsk.doEvents() 
 
-        # generate the valid operations
-        gtf = cam.generateToolpath(operations)
-
-        # wait for the generation to be finished and update progress bar
-        while not gtf.isGenerationCompleted:
-            # calculate progress and update progress bar
-            total = gtf.numberOfOperations
-            completed = gtf.numberOfCompleted
-            progress = int(completed * 100 / total)
-            progressDialog.progressValue = progress
-            adsk.doEvents() # allow Fusion to update so the screen doesn't freeze
+        completed = waitForToolpaths(job, progressDialog)
 
         # generation done
         progressDialog.progressValue = 100
         progressDialog.hide()
+        if not completed:
+            ui.messageBox('Cancelled, the NC program was not posted.')
+            return
 
         #################### ncProgram and post-processing ####################
-        # get the post library from library manager
-        postLibrary = libraryManager.postLibrary
-
-        # query post library to get postprocessor list
-        postQuery = postLibrary.createQuery(adsk.cam.LibraryLocations.LocalLibraryLocation)
-        postQuery.vendor = "Thermwood"
-        postQuery.capability = adsk.cam.PostCapabilities.Milling
-        postConfigs = postQuery.execute()
-
-        # find "Custom Thermwood 3-Axis" post in the post library and import it to local library
-        for config in postConfigs:
-            if config.description == 'Custom Thermwood 3-Axis':
-                url = adsk.core.URL.create("user://")
-                importedURL = postLibrary.importPostConfiguration(config, url, "Thermwood")
-
-        # get the imported local post config
-        postConfig = postLibrary.postConfigurationAtURL(importedURL)
-       
-        # create NCProgramInput object
-        ncInput = cam.ncPrograms.createInput()
-        ncInput.displayName = 'Template from preset'
-
-        # change some nc program parameters
-        ncParameters = ncInput.parameters
-        ncParameters.itemByName('nc_program_filename').value.value = name
-        ncParameters.itemByName('nc_program_openInEditor').value.value = True
-
-        # set the defualt output folder for the NC program to desktop
-        desktopDirectory = os.path.expanduser("~/Desktop").replace('\\', '/') 
-        ncParameters.itemByName('nc_program_output_folder').value.value = desktopDirectory
+
+        postConfig = importPostConfig(libraryManager.postLibrary)
 
         # ask the user to select the output folder for the NC program
-        folderDlg = ui.createFolderDialog()
-        folderDlg.title = 'Select output folder for NC program'
-        folderDlg.initialDirectory = desktopDirectory
-        folderDlg.showDialog()
-        outputFolder = folderDlg.folder
-        ncParameters.itemByName('nc_program_output_folder').value.value = outputFolder
+        outputFolder = askForOutputFolder(ui, 'Select output folder for NC program')
+        if not outputFolder:
+            return
+
+        job.cacheKey = cacheKey
+        written = postTemplate(job, postConfig, outputFolder, True)
+        if hasAllToolpaths(job):
+            toolpathCache.store(TOOLPATH_CACHE_DIR, job.cacheKey, written, dxfFile)
         
-        # select the operations to generate
-        ncInput.operations = [scribeOP, boreOP, finalOp]
+    except:
+        if ui:
+            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
-        # add a new ncprogram from the ncprogram input
-        newProgram = cam.ncPrograms.add(ncInput) 
 
-        # set post processor
-        newProgram.postConfiguration = postConfig
+class TemplateJob:
+    ''' One template being made: its document, CAM product and operations '''
+
+    def __init__(self, dxfFile: str, thickness: float, name: str):
+        self.dxfFile = dxfFile
+        self.thickness = thickness
+        self.name = name
+        self.doc: adsk.core.Document = None
+        self.cam: adsk.cam.CAM = None
+        self.operations: list = []
+        self.future: adsk.cam.GenerateToolpathFuture = None
+        # (operation name, seconds) filled in by waitForToolpaths
+        self.timings: list = []
+        # Key of the job in the toolpath cache
+        self.cacheKey: str = None
+
+
+def checkDXF(dxfFile: str) -> dict:
+    ''' Check the DXF's layers and loops before any Fusion work, see dxfCheck.checkFile '''
+    return dxfCheck.checkFile(dxfFile, OUTLINE_LAYER, SCRIBE_LAYER, SCRIBE_REQUIRED, DXF_DEFAULT_UNITS,
+                              dxfCheck.toMillimeters(OPERATION_PARAMETERS['bore']['holeDiameterMaximum']), DXF_CHECK_CACHE)
+
+
+def askForDXF(ui: adsk.core.UserInterface) -> str:
+    ''' Ask the user for a DXF file, returns None when cancelled '''
+    fileDialog = ui.createFileDialog()
+    fileDialog.isMultiSelectEnabled = False
+    fileDialog.title = "Open DXF File"
+    fileDialog.filter = "DXF files (*.dxf)"
+    dialogResult = fileDialog.showOpen()
+    if dialogResult != adsk.core.DialogResults.DialogOK:
+        return None
+    return fileDialog.filename
+
+
+def askForOutputFolder(ui: adsk.core.UserInterface, title: str) -> str:
+    ''' Ask the user for a folder, starting on the desktop, returns None when cancelled '''
+    desktopDirectory = os.path.expanduser("~/Desktop").replace('\\', '/') 
+    folderDlg = ui.createFolderDialog()
+    folderDlg.title = title
+    folderDlg.initialDirectory = desktopDirectory
+    if folderDlg.showDialog() != adsk.core.DialogResults.DialogOK:
+        return None
+    return folderDlg.folder
+
+
+def startTemplate(dxfFile: str, thickness: float, name: str, tools: dict) -> TemplateJob:
+    ''' Create a document with the template bodies, setup and operations and start generating
+    the toolpaths. Returns the job without waiting for the generation, or None if no bodies
+    could be made from the DXF. '''
+    app = adsk.core.Application.get()
+    ui  = app.userInterface
+    job = TemplateJob(dxfFile, thickness, name)
+
+    # create a new empty document
+    job.doc = app.documents.add(adsk.core.DocumentTypes.FusionDesignDocumentType)
+
+    # get the design document used to create the sample part
+    design = app.activeProduct
+
+    # switch to manufacturing space
+    camWS = ui.workspaces.itemById('CAMEnvironment') 
+    camWS.activate()
+
+    # get the CAM product
+    products = job.doc.products
+
+    #################### create template bodies ####################
+
+    models = createBodies(design, thickness, dxfFile)
+    if not models:
+        return None
+
+    #################### create setup ####################
+    cam = adsk.cam.CAM.cast(products.itemByProductType("CAMProductType"))
+    job.cam = cam
+    setups = cam.setups
+    setupInput = setups.createInput(adsk.cam.OperationTypes.MillingOperation)
+    setupInput.models = models
+
+    # configure properties
+    setup = setups.add(setupInput)
+    setup.name = 'Preset Template Setup'
+    setup.stockMode = adsk.cam.SetupStockModes.RelativeBoxStock
+    # set offset mode and the stock offsets
+    setParameters(setup.parameters, SETUP_PARAMETERS)
+    # set setup origin
+    setup.parameters.itemByName('wcs_origin_boxPoint').value.value = SetupWCSPoint.BOTTOM_XMAX_YMAX.value
+
+    job.operations = createOperations(design, setup, tools)
+
+    #################### generate operations ####################
+    # add the valid operations to generate
+    operations = adsk.core.ObjectCollection.create()
+    for op in job.operations:
+        operations.add(op)
+
+    # generate the valid operations, this returns straight away and generates in the background
+    job.future = cam.generateToolpath(operations)
+    return job
+
+
+def createOperations(design: adsk.fusion.Design, setup: adsk.cam.Setup, tools: dict) -> list:
+    ''' Add the scribe, bore and cutout operations to setup and return them. The scribe
+    operation is left out when the DXF had no scribe layer. '''
+    operations = []
+
+    #################### scribe operation ####################
+    #Find the sketch named after the scribe layer
+    scribe_sketch = None
+    for sketch in design.rootComponent.sketches:
+        if sketch.name == SCRIBE_LAYER:
+            scribe_sketch = sketch
+            break
+
+    if scribe_sketch:
+        # create the scribe operation input
+        input: adsk.cam.OperationInput = setup.operations.createInput('trace')
+        input.displayName = 'scribe'
+        input.tool = tools['liner']
 
-        # modify tolerance and chord length
-        postParameters = newProgram.postParameters
-        postParameters.itemByName('builtin_tolerance').value.value = 0.01  
-        postParameters.itemByName('builtin_minimumChordLength').value.value = 0.33  
+        # Apply the sketch to the operation input
+        pocketSelection: adsk.cam.CadContours2dParameterValue = input.parameters.itemByName('curves').value
+        chains: adsk.cam.CurveSelections = pocketSelection.getCurveSelections()
+        chain: adsk.cam.SketchSelection = chains.createNewSketchSelection()
+        chain.inputGeometry = [scribe_sketch]
+        chain.loopType = adsk.cam.LoopTypes.OnlyOutsideLoops
+        chain.sideType = adsk.cam.SideTypes.AlwaysInsideSideType
+        pocketSelection.applyCurveSelections(chains)
+        setParameters(input.parameters, OPERATION_PARAMETERS['scribe'])
 
-        # update/apply post parameters
-        newProgram.updatePostParameters(postParameters)
+        # Add to the setup
+        operations.append(setup.operations.add(input))
+
+    #################### bore operation ####################
+    # create the bore operation input
+    input = setup.operations.createInput('bore')
+    input.tool = tools['bore']
+    input.displayName = 'bore'
+    input.parameters.itemByName('useStockToLeave').value.value = True
+    input.parameters.itemByName('useAngle').value.value = True
+    setParameters(input.parameters, OPERATION_PARAMETERS['bore'])
+    operations.append(setup.operations.add(input))
+
+    #################### finish operation ####################
+    # create the finish operation input
+    input = setup.operations.createInput('contour2d')
+    input.tool = tools['finishing']
+    input.displayName = 'cutout'
+    input.parameters.itemByName('doMultipleDepths').value.value = True
+    setParameters(input.parameters, OPERATION_PARAMETERS['cutout'])
+    finalOp = setup.operations.add(input)
+
+    # Add silhouette selection to the geometries of finalOp
+    cadcontours2dParam: adsk.cam.CadContours2dParameterValue = finalOp.parameters.itemByName('contours').value
+    chains = cadcontours2dParam.getCurveSelections()
+    chains.createNewSilhouetteSelection()
+    cadcontours2dParam.applyCurveSelections(chains)
+
+    operations.append(finalOp)
+    return operations
+
+
+def importPostConfig(postLibrary: adsk.cam.PostLibrary) -> adsk.cam.PostConfiguration:
+    ''' Import the POST_CONFIG_DESCRIPTION post into the local library and return it '''
+    # query post library to get postprocessor list
+    postQuery = postLibrary.createQuery(adsk.cam.LibraryLocations.LocalLibraryLocation)
+    postQuery.vendor = "Thermwood"
+    postQuery.capability = adsk.cam.PostCapabilities.Milling
+    postConfigs = postQuery.execute()
+
+    # find the post in the post library and import it to local library
+    importedURL = None
+    for config in postConfigs:
+        if config.description == POST_CONFIG_DESCRIPTION:
+            url = adsk.core.URL.create("user://")
+            importedURL = postLibrary.importPostConfiguration(config, url, "Thermwood")
+    if not importedURL:
+        raise RuntimeError(f'Post "{POST_CONFIG_DESCRIPTION}" was not found in the local post library')
+
+    # get the imported local post config
+    return postLibrary.postConfigurationAtURL(importedURL)
+
+
+def waitForToolpaths(job: TemplateJob, progressDialog: adsk.core.ProgressDialog = None, showProgress: bool = True) -> bool:
+    ''' Wait for the job's toolpaths. Returns False if the progress dialog was cancelled first.
+
+    Checks every GENERATION_POLL_INTERVAL seconds and sleeps in between so the generation gets
+    the CPU, and updates the progress bar at most every PROGRESS_UPDATE_INTERVAL seconds.
+    How long each operation took is stored in job.timings and appended to GENERATION_LOG.
+    '''
+    gtf = job.future
+    started = time.perf_counter()
+    lastFinished = started
+    lastUpdate = 0.0
+    pending = list(job.operations)
+    completed = True
+
+    while True:
+        now = time.perf_counter()
+
+        # Operations finish one after the other, each is charged the time since the previous one
+        for op in [op for op in pending if isOperationDone(op)]:
+            job.timings.append((op.name, now - lastFinished))
+            lastFinished = now
+            pending.remove(op)
+
+        if gtf.isGenerationCompleted:
+            break
+
+        if progressDialog:
+            if progressDialog.wasCancelled:
+                completed = False
+                break
+            if showProgress and now - lastUpdate >= PROGRESS_UPDATE_INTERVAL:
+                total = gtf.numberOfOperations
+                progressDialog.progressValue = int(gtf.numberOfCompleted * 100 / total) if total else 0
+                lastUpdate = now
 
-        # set post options, by default post process only valid operations containing toolpath data
-        postOptions = adsk.cam.NCProgramPostProcessOptions.create()
+        adsk.doEvents() # allow Fusion to update so the screen doesn't freeze
+        time.sleep(GENERATION_POLL_INTERVAL)
 
-        # post-process
-        newProgram.postProcess(postOptions)
-        
-    except:
-        if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+    if completed:
+        now = time.perf_counter()
+        for op in pending:
+            job.timings.append((op.name, now - lastFinished))
+            lastFinished = now
+    logTimings(job, completed)
+    return completed
+
+
+def isOperationDone(op: adsk.cam.OperationBase) -> bool:
+    return not op.isGenerating and (op.hasToolpath or op.hasError)
+
+
+def hasAllToolpaths(job: TemplateJob) -> bool:
+    ''' True when every operation generated a toolpath without errors, only then is the posted program cached '''
+    return all(op.hasToolpath and not op.hasError for op in job.operations)
+
+
+def logTimings(job: TemplateJob, completed: bool):
+    ''' Append the job's operation times to GENERATION_LOG '''
+    try:
+        isNew = not os.path.exists(GENERATION_LOG)
+        with open(GENERATION_LOG, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if isNew:
+                writer.writerow(['time', 'dxf', 'name', 'operation', 'seconds', 'status'])
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+            for opName, seconds in job.timings:
+                writer.writerow([stamp, os.path.basename(job.dxfFile), job.name, opName, round(seconds, 2),
+                                 'ok' if completed else 'cancelled'])
+    except OSError:
+        # The timings are only for analysis, a locked log file shouldn't stop the job
+        pass
+
+
+def postTemplate(job: TemplateJob, postConfig: adsk.cam.PostConfiguration, outputFolder: str, openInEditor: bool) -> list:
+    ''' Post process the job's operations into outputFolder, returns the files written '''
+    cam = job.cam
+
+    # create NCProgramInput object
+    ncInput = cam.ncPrograms.createInput()
+    ncInput.displayName = 'Template from preset'
+
+    # change some nc program parameters
+    ncParameters = ncInput.parameters
+    ncParameters.itemByName('nc_program_filename').value.value = job.name
+    ncParameters.itemByName('nc_program_openInEditor').value.value = openInEditor
+    ncParameters.itemByName('nc_program_output_folder').value.value = outputFolder.replace('\\', '/')
+
+    # select the operations to generate
+    ncInput.operations = job.operations
+
+    # add a new ncprogram from the ncprogram input
+    newProgram = cam.ncPrograms.add(ncInput) 
+
+    # set post processor
+    newProgram.postConfiguration = postConfig
+
+    # modify tolerance and chord length
+    postParameters = newProgram.postParameters
+    for paramName, value in POST_PARAMETERS.items():
+        postParameters.itemByName(paramName).value.value = value
+
+    # update/apply post parameters
+    newProgram.updatePostParameters(postParameters)
+
+    # set post options, by default post process only valid operations containing toolpath data
+    postOptions = adsk.cam.NCProgramPostProcessOptions.create()
+
+    # post-process, the post names the files so look for what changed in the folder
+    before = listOutputs(outputFolder, job.name)
+    newProgram.postProcess(postOptions)
+    return sorted(path for path, state in listOutputs(outputFolder, job.name).items() if before.get(path) != state)
+
+
+def listOutputs(folder: str, name: str) -> dict:
+    ''' Return {path: (modified time, size)} of the files in folder whose name starts with the program name '''
+    try:
+        return {entry.path: (entry.stat().st_mtime_ns, entry.stat().st_size) for entry in os.scandir(folder)
+                if entry.is_file() and entry.name.startswith(name)}
+    except OSError:
+        return {}
+
+
+def setParameters(parameters: adsk.cam.CAMParameters, expressions: dict):
+    ''' Set parameter expressions by name '''
+    for paramName, expression in expressions.items():
+        parameters.itemByName(paramName).expression = expression
+
+
+def toolpathSettings(tools: dict) -> dict:
+    ''' Everything besides the DXF and thickness that changes the posted NC program, tools is the result of selectTools '''
+    return {
+        'layers': [OUTLINE_LAYER, SCRIBE_LAYER],
+        'toolLibrary': TOOL_LIBRARY_URL,
+        'tools': TOOL_CHOICES,
+        # The picked tools themselves, so editing a tool in the library invalidates the cache
+        'toolRecords': {role: toolpathCache.textHash(tool.toJson()) for role, tool in tools.items()},
+        'setup': SETUP_PARAMETERS,
+        'wcs': SetupWCSPoint.BOTTOM_XMAX_YMAX.value,
+        'operations': OPERATION_PARAMETERS,
+        'post': POST_CONFIG_DESCRIPTION,
+        'postFile': toolpathCache.fileHash(POST_PROCESSOR_FILE),
+        'postParameters': POST_PARAMETERS
+    }
+
+
+def selectTools(toolLibraries: adsk.cam.ToolLibraries):
+    ''' Return a dict of the TOOL_CHOICES roles to the tool picked for each, None when nothing matches '''
+    url = adsk.core.URL.create(TOOL_LIBRARY_URL)
+    toolLibrary = toolLibraries.toolLibraryAtURL(url)
+    index = toolIndex.loadToolIndex(toolLibrary, TOOL_LIBRARY_URL, TOOL_INDEX_CACHE)
+
+    tools = {}
+    for role, toolNumber in index.select(TOOL_CHOICES).items():
+        choice = TOOL_CHOICES[role]
+        tool = toolLibrary.item(toolNumber) if toolNumber is not None else None
+        if tool:
+            tool.parameters.itemByName('tool_number').value.value = choice['number']
+        tools[role] = tool
+    return tools
 
 
 def getLibrariesURLs(libraries: adsk.cam.ToolLibraries, url: adsk.core.URL):
@@ -340,7 +599,7 @@ def getToolsFromLibraryByTypeDiameterRangeAndMinFluteLength(toolLibrary: adsk.ca
     return tools
 
 
-def createBodies(design: adsk.fusion.Design, thickness: float) -> adsk.fusion.BRepBody:
+def createBodies(design: adsk.fusion.Design, thickness: float, dxfFile: str) -> adsk.fusion.BRepBody:
     ''' Return a list of BRepBody entities created from the DXF file '''
     ui = None
     try:
@@ -349,59 +608,45 @@ def createBodies(design: adsk.fusion.Design, thickness: float) -> adsk.fusion.BR
         ui  = app.userInterface
         rootComp = design.rootComponent
 
-        # Open the DXF file
-        fileDialog = ui.createFileDialog()
-        fileDialog.isMultiSelectEnabled = False
-        fileDialog.title = "Open DXF File"
-        fileDialog.filter = "DXF files (*.dxf)"
-        dialogResult = fileDialog.showOpen()
-        if dialogResult != adsk.core.DialogResults.DialogOK:
-            return
-
-        dxfFile = fileDialog.filename
-
         # Create a new sketch for each layer in the DXF file
         importManager = app.importManager
         dxfOptions = importManager.createDXF2DImportOptions(dxfFile, rootComp.xYConstructionPlane)
         importManager.importToTarget(dxfOptions, rootComp)
 
-        # Find the sketch named "0"
+        # Find the sketch named after the outline layer
         sketch0 = None
         for sketch in rootComp.sketches:
-            if sketch.name == "0":
+            if sketch.name == OUTLINE_LAYER:
                 sketch0 = sketch
                 break
 
         if not sketch0:
-            ui.messageBox('Sketch "0" not found.')
+            ui.messageBox(f'Sketch "{OUTLINE_LAYER}" not found.')
             return
 
-        # Extrude all profiles in the sketch named "0" that are not contained within other profiles
+        # Fetch every bounding box once, each one is a round trip through the API
+        profiles = list(sketch0.profiles)
+        boxes = []
+        for prof in profiles:
+            bbox = prof.boundingBox
+            boxes.append((bbox.minPoint.x, bbox.minPoint.y, bbox.maxPoint.x, bbox.maxPoint.y))
+
+        # Extrude the outer profiles and any islands inside holes, all in one feature
+        solidProfiles = adsk.core.ObjectCollection.create()
+        for index in profileNesting.solidIndices(boxes):
+            solidProfiles.add(profiles[index])
+        if solidProfiles.count == 0:
+            return model
+
         extrudes = rootComp.features.extrudeFeatures
-        for prof in sketch0.profiles:
-            isContained = False
-            for otherProf in sketch0.profiles:
-                if prof != otherProf and isProfileContainedBy(prof, otherProf):
-                    isContained = True
-                    break
-            if not isContained:
-                extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-                thicnkness = thickness*-2.54
-                distance = adsk.core.ValueInput.createByReal(thickness)  
-                extInput.setDistanceExtent(False, distance)
-                bod=extrudes.add(extInput)
-                model.append(bod.bodies[0])
+        extInput = extrudes.createInput(solidProfiles, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        distance = adsk.core.ValueInput.createByReal(thickness)
+        extInput.setDistanceExtent(False, distance)
+        bod = extrudes.add(extInput)
+        for body in bod.bodies:
+            model.append(body)
         return model
     
     except:
         if ui:
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
-    
-def isProfileContainedBy(profile1, profile2):
-    ''' Helper Function to check if a profile is contained by another profile '''
-    bbox1 = profile1.boundingBox
-    bbox2 = profile2.boundingBox
-    return (bbox1.minPoint.x >= bbox2.minPoint.x and
-        bbox1.minPoint.y >= bbox2.minPoint.y and
-        bbox1.maxPoint.x <= bbox2.maxPoint.x and
-        bbox1.maxPoint.y <= bbox2.maxPoint.y)
\ No newline at end of file
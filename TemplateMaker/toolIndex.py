@@ -0,0 +1,95 @@
+''' On-disk index of a tool library by tool type and diameter '''
+
+import bisect
+import hashlib
+import json
+import os
+
+
+class ToolIndex:
+    ''' Tools of one library grouped by type and sorted by diameter (inches) '''
+
+    def __init__(self, records):
+        # records are dicts with index, type, diameter and fluteLength
+        self.records = records
+        self.byType: dict[str, list] = {}
+        for record in records:
+            self.byType.setdefault(record['type'], []).append(record)
+        for tools in self.byType.values():
+            # Keep library order among tools of the same diameter
+            tools.sort(key=lambda record: (record['diameter'], record['index']))
+        self.diameters = {toolType: [record['diameter'] for record in tools] for toolType, tools in self.byType.items()}
+
+    def matches(self, toolType: str, minDiameter: float = None, maxDiameter: float = None, minFluteLength: float = None) -> list:
+        ''' Return the library indexes of the tools of toolType with minDiameter <= diameter < maxDiameter, in library order '''
+        tools = self.byType.get(toolType, [])
+        start = 0 if minDiameter is None else bisect.bisect_left(self.diameters.get(toolType, []), minDiameter)
+        found = []
+        for record in tools[start:]:
+            if maxDiameter is not None and record['diameter'] >= maxDiameter:
+                break
+            if minFluteLength is not None and (record['fluteLength'] or 0) < minFluteLength:
+                continue
+            found.append(record['index'])
+        return sorted(found)
+
+    def select(self, choices: dict) -> dict:
+        ''' Return {role: library index or None} for choices of {role: {type, minDiameter, maxDiameter, minFluteLength}}.
+
+        Picks the same tools as walking the library in order, taking every match for a role and
+        stopping once each role has one: the last match of each role up to where the walk stops.
+        '''
+        found = {role: self.matches(choice['type'], choice.get('minDiameter'), choice.get('maxDiameter'), choice.get('minFluteLength'))
+                 for role, choice in choices.items()}
+        stop = max(matches[0] for matches in found.values()) if all(found.values()) else None
+        return {role: ([index for index in matches if stop is None or index <= stop] or [None])[-1]
+                for role, matches in found.items()}
+
+
+def libraryHash(toolLibrary) -> str:
+    ''' Hash of the library contents, changes whenever a tool is added, removed or edited '''
+    return hashlib.sha1(toolLibrary.toJson().encode('utf-8')).hexdigest()
+
+
+def readParameter(tool, name):
+    parameter = tool.parameters.itemByName(name)
+    return parameter.value.value if parameter else None
+
+
+def buildRecords(toolLibrary) -> list:
+    ''' Read type, diameter and flute length of every tool, the slow part the cache avoids '''
+    records = []
+    for index, tool in enumerate(toolLibrary):
+        diameter = readParameter(tool, 'tool_diameter')
+        fluteLength = readParameter(tool, 'tool_fluteLength')
+        records.append({
+            'index': index,
+            'type': readParameter(tool, 'tool_type'),
+            # Fusion reports lengths in cm
+            'diameter': diameter / 2.54 if diameter is not None else 0.0,
+            'fluteLength': fluteLength / 2.54 if fluteLength is not None else None
+        })
+    return records
+
+
+def loadToolIndex(toolLibrary, libraryUrl: str, cachePath: str) -> ToolIndex:
+    ''' Return the index of toolLibrary, from cachePath when the library hasn't changed since it was written '''
+    currentHash = libraryHash(toolLibrary)
+    try:
+        with open(cachePath, 'r') as f:
+            cache = json.load(f)
+        if cache.get('library') == libraryUrl and cache.get('hash') == currentHash:
+            return ToolIndex(cache['tools'])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    records = buildRecords(toolLibrary)
+    try:
+        tempPath = cachePath + '.tmp'
+        with open(tempPath, 'w') as f:
+            json.dump({'library': libraryUrl, 'hash': currentHash, 'tools': records}, f)
+        os.replace(tempPath, cachePath)
+    except OSError:
+        # The index still works for this run without the cache
+        pass
+    return ToolIndex(records)
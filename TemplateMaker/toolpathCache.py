@@ -0,0 +1,87 @@
+''' Cache of posted NC programs keyed by everything that goes into making them '''
+
+import hashlib
+import json
+import os
+import shutil
+
+# Bump when a change to the script changes the toolpaths it makes, so old entries aren't reused
+CACHE_VERSION = 1
+# Written last into an entry, an entry without it is incomplete
+META_FILENAME = 'meta.json'
+
+
+def textHash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def fileHash(path: str) -> str:
+    ''' Hash of the file contents, None if it doesn't exist '''
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def fingerprint(dxfFile: str, thickness: float, settings: dict) -> str:
+    ''' Hash the DXF contents, the thickness (cm) and the tool, setup, operation and post settings '''
+    digest = hashlib.sha1()
+    with open(dxfFile, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    key = {'version': CACHE_VERSION, 'thickness': round(thickness, 6), 'settings': settings}
+    digest.update(json.dumps(key, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def lookup(cacheDir: str, key: str) -> list:
+    ''' Return the cached NC files for key, or None if there is no complete entry '''
+    entryDir = os.path.join(cacheDir, key)
+    try:
+        with open(os.path.join(entryDir, META_FILENAME), 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    files = [os.path.join(entryDir, fileName) for fileName in meta.get('files', [])]
+    if not files or not all(os.path.exists(path) for path in files):
+        return None
+    return files
+
+
+def restore(cachedFiles: list, outputFolder: str, name: str) -> list:
+    ''' Copy cached NC files to outputFolder, renamed for the program name. Returns the new paths. '''
+    written = []
+    for number, path in enumerate(cachedFiles):
+        extension = os.path.splitext(path)[1]
+        suffix = f'_{number + 1}' if len(cachedFiles) > 1 else ''
+        target = os.path.join(outputFolder, name + suffix + extension)
+        shutil.copyfile(path, target)
+        written.append(target)
+    return written
+
+
+def store(cacheDir: str, key: str, files: list, dxfFile: str):
+    ''' Save the posted NC files under key. Failing to cache never fails the job. '''
+    if not files:
+        return
+    entryDir = os.path.join(cacheDir, key)
+    tempDir = entryDir + '.tmp'
+    try:
+        shutil.rmtree(tempDir, ignore_errors=True)
+        os.makedirs(tempDir)
+        names = []
+        for number, path in enumerate(files):
+            # Cached files are renamed on restore, only the extension matters
+            fileName = f'program{number}{os.path.splitext(path)[1]}'
+            shutil.copyfile(path, os.path.join(tempDir, fileName))
+            names.append(fileName)
+        with open(os.path.join(tempDir, META_FILENAME), 'w') as f:
+            json.dump({'dxf': os.path.basename(dxfFile), 'files': names}, f, indent=1)
+        shutil.rmtree(entryDir, ignore_errors=True)
+        os.replace(tempDir, entryDir)
+    except OSError:
+        shutil.rmtree(tempDir, ignore_errors=True)
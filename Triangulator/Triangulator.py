@@ -1,4 +1,218 @@
-import adsk.core, adsk.fusion, adsk.cam, traceback, csv
+import adsk.core, adsk.fusion, adsk.cam, traceback, csv, math, os
+from . import radiusFit
+
+# numpy is optional, it vectorizes the apex calculation for large files
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# What to create from the measurements:
+#   'fit'       - fit a circle to each section and draw one arc (or spline) per section
+#   'triangles' - draw every triangle into one sketch, side by side
+#   'points'    - put the measured apex of every row into one sketch as a point cloud
+#   'mesh'      - build one mesh body out of the measured triangles
+#   'sketches'  - the original behavior, one constrained sketch per row
+outputMode = 'fit'
+# Gap between triangles or sections laid out in a row (inches)
+layoutSpacing = 2.0
+# Draw a smooth spline through the measured points instead of the fitted arc
+fitSpline = False
+# Rows parsed at a time, keeps memory flat for large survey files
+chunkSize = 5000
+
+def formsTriangle(a, b, c):
+    return a > 0 and a + b > c and b + c > a and a + c > b
+
+def computeApexes(sides):
+    # sides is a list of (a, b, c). Side a lies on the x axis from the origin, b runs from the
+    # origin to the apex and c from the end of a to the apex. Returns [(x, y)] with None for
+    # rows that don't form a triangle.
+    if not sides:
+        return []
+    if np is not None:
+        s = np.asarray(sides, dtype=float)
+        a, b, c = s[:, 0], s[:, 1], s[:, 2]
+        valid = (a > 0) & (a + b > c) & (b + c > a) & (a + c > b)
+        safeA = np.where(valid, a, 1.0)
+        x = (a * a + b * b - c * c) / (2 * safeA)
+        y = np.sqrt(np.clip(b * b - x * x, 0, None))
+        return [(px, py) if ok else None for px, py, ok in zip(x.tolist(), y.tolist(), valid.tolist())]
+
+    apexes = []
+    for a, b, c in sides:
+        if not formsTriangle(a, b, c):
+            apexes.append(None)
+            continue
+        x = (a * a + b * b - c * c) / (2 * a)
+        apexes.append((x, math.sqrt(max(b * b - x * x, 0.0))))
+    return apexes
+
+def getCsvFile(ui):
+    # Asks for the measurements file, starting in this script's folder
+    fileDialog = ui.createFileDialog()
+    fileDialog.isMultiSelectEnabled = False
+    fileDialog.title = 'Select Triangle Measurements'
+    fileDialog.filter = 'CSV files (*.csv)|*.csv'
+    fileDialog.initialDirectory = os.path.dirname(os.path.abspath(__file__))
+    if fileDialog.showOpen() != adsk.core.DialogResults.DialogOK:
+        return None
+    return fileDialog.filename
+
+def readChunks(path, skipped):
+    # Streams the CSV as lists of (row number, (a, b, c)) in cm, chunkSize rows at a time.
+    # Rows that can't be parsed are added to skipped.
+    chunk = []
+    with open(path, 'r', newline='') as csvfile:
+        for rowNumber, row in enumerate(csv.reader(csvfile), start=1):
+            if not any(value.strip() for value in row):
+                continue
+            try:
+                a, b, c = (float(value) * 2.54 for value in row[:3])
+            except ValueError:
+                # A header line is expected, anything later is a bad row
+                if rowNumber > 1:
+                    skipped.append(rowNumber)
+                continue
+            chunk.append((rowNumber, (a, b, c)))
+            if len(chunk) >= chunkSize:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def readSides(chunks, skipped):
+    # Flattens the chunks back into (a, b, c), rows that don't form a triangle are added to skipped
+    for chunk in chunks:
+        for row, sides in chunk:
+            if formsTriangle(*sides):
+                yield sides
+            else:
+                skipped.append(row)
+
+def drawTriangles(sketch, chunks):
+    # Draws every triangle into one sketch side by side, returns the rows that were skipped
+    lines = sketch.sketchCurves.sketchLines
+    spacing = layoutSpacing * 2.54
+    offset = 0.0
+    skipped = []
+
+    # Hold off solving the sketch until everything is drawn
+    sketch.isComputeDeferred = True
+    try:
+        for chunk in chunks:
+            apexes = computeApexes([sides for _, sides in chunk])
+            for (row, (a, b, c)), apex in zip(chunk, apexes):
+                if apex is None:
+                    skipped.append(row)
+                    continue
+                x, y = apex
+                left = min(0.0, x)
+                p0 = adsk.core.Point3D.create(offset - left, 0, 0)
+                p1 = adsk.core.Point3D.create(offset - left + a, 0, 0)
+                p2 = adsk.core.Point3D.create(offset - left + x, y, 0)
+
+                base = lines.addByTwoPoints(p0, p1)
+                side1 = lines.addByTwoPoints(base.startSketchPoint, p2)
+                lines.addByTwoPoints(base.endSketchPoint, side1.endSketchPoint)
+
+                # Next triangle starts past the widest point of this one
+                offset += max(a, x) - left + spacing
+    finally:
+        sketch.isComputeDeferred = False
+    return skipped
+
+def layoutSections(sides):
+    # Yields (a, [(x, y)], start) per section with the apexes moved so sections sit side by side,
+    # start is where the section's baseline begins. Rows that don't form a triangle are left out.
+    spacing = layoutSpacing * 2.54
+    offset = 0.0
+    for a, section in radiusFit.chainSections(sides):
+        apexes = [apex for apex in computeApexes([(a, b, c) for b, c in section]) if apex]
+        if not apexes:
+            continue
+        left = min(0.0, min(x for x, _ in apexes))
+        right = max(a, max(x for x, _ in apexes))
+        yield a, [(offset - left + x, y) for x, y in apexes], offset - left
+        offset += right - left + spacing
+
+def drawPointCloud(sketch, sides):
+    # Adds every measured apex to one sketch as a point, returns the number of points
+    points = sketch.sketchPoints
+    count = 0
+    sketch.isComputeDeferred = True
+    try:
+        for _, apexes, _ in layoutSections(sides):
+            for x, y in apexes:
+                points.add(adsk.core.Point3D.create(x, y, 0))
+            count += len(apexes)
+    finally:
+        sketch.isComputeDeferred = False
+    return count
+
+def buildMesh(design, sides):
+    # Builds one mesh body out of the measured triangles, each section shares its baseline
+    # nodes. Returns the number of triangles.
+    coordinates = []
+    indices = []
+    for a, apexes, start in layoutSections(sides):
+        first = len(coordinates) // 3
+        coordinates.extend((start, 0.0, 0.0, start + a, 0.0, 0.0))
+        for number, (x, y) in enumerate(apexes, start=first + 2):
+            coordinates.extend((x, y, 0.0))
+            indices.extend((first, first + 1, number))
+    if not indices:
+        return 0
+
+    rootComp = design.rootComponent
+    # Parametric designs need the mesh to live in a base feature, empty normals are calculated by Fusion
+    if design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+        baseFeature = rootComp.features.baseFeatures.add()
+        baseFeature.startEdit()
+        try:
+            rootComp.meshBodies.addByTriangleMeshData(coordinates, indices, [], [])
+        finally:
+            baseFeature.finishEdit()
+    else:
+        rootComp.meshBodies.addByTriangleMeshData(coordinates, indices, [], [])
+    return len(indices) // 3
+
+def fitSections(sketch, sides):
+    # Fits each section of measurements and draws one curve per section, returns the report lines
+    report = []
+    sketch.isComputeDeferred = True
+    try:
+        for index, (a, section) in enumerate(radiusFit.chainSections(sides), start=1):
+            fitter = radiusFit.CircleFitter()
+            for apex in computeApexes([(a, b, c) for b, c in section]):
+                if apex:
+                    fitter.add(*apex)
+            if len(fitter) < 3:
+                report.append('Section {}: not enough valid measurements to fit'.format(index))
+                continue
+
+            try:
+                cx, cy, radius, rms, worst = fitter.fit()
+            except ValueError as e:
+                report.append('Section {}: {}'.format(index, e))
+                continue
+
+            if fitSpline:
+                points = adsk.core.ObjectCollection.create()
+                for x, y in fitter.sortedPoints(cx, cy):
+                    points.add(adsk.core.Point3D.create(x, y, 0))
+                sketch.sketchCurves.sketchFittedSplines.add(points)
+            else:
+                start, sweep = fitter.sweep(cx, cy)
+                center = adsk.core.Point3D.create(cx, cy, 0)
+                startPoint = adsk.core.Point3D.create(cx + radius * math.cos(start), cy + radius * math.sin(start), 0)
+                sketch.sketchCurves.sketchArcs.addByCenterStartSweep(center, startPoint, sweep)
+
+            report.append('Section {} (baseline {:.4f} in, {} points): radius {:.4f} in, RMS residual {:.4f} in, max {:.4f} in'.format(
+                index, a / 2.54, len(fitter), radius / 2.54, rms / 2.54, worst / 2.54))
+    finally:
+        sketch.isComputeDeferred = False
+    return report
 
 def run(context):
     ui = None
@@ -11,7 +225,36 @@ def run(context):
         xyPlane = rootComp.xYConstructionPlane
 
         # Path to the CSV file
-        csv_file_path = r"fusion-code\Triangulator\Triangles.csv"
+        csv_file_path = getCsvFile(ui)
+        if not csv_file_path:
+            return
+
+        skipped = []
+        chunks = readChunks(csv_file_path, skipped)
+
+        if outputMode == 'fit':
+            sketch = sketches.add(xyPlane)
+            sketch.name = 'Fitted Radius'
+            report = fitSections(sketch, readSides(chunks, skipped))
+            ui.messageBox('\n'.join(report) if report else 'No measurements found.', 'Compound Radius')
+        elif outputMode == 'triangles':
+            sketch = sketches.add(xyPlane)
+            sketch.name = 'Triangles'
+            skipped.extend(drawTriangles(sketch, chunks))
+        elif outputMode == 'points':
+            sketch = sketches.add(xyPlane)
+            sketch.name = 'Measured Points'
+            count = drawPointCloud(sketch, readSides(chunks, skipped))
+            ui.messageBox('Added {} measured points.'.format(count))
+        elif outputMode == 'mesh':
+            count = buildMesh(design, readSides(chunks, skipped))
+            ui.messageBox('Created a mesh with {} triangles.'.format(count))
+
+        if outputMode != 'sketches':
+            if skipped:
+                ui.messageBox('Rows that could not be read or do not form a triangle were skipped: {}'.format(
+                    ', '.join(str(row) for row in sorted(skipped))))
+            return
 
         with open(csv_file_path, 'r') as csvfile:
             csvreader = csv.reader(csvfile)
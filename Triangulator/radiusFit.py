@@ -0,0 +1,137 @@
+"""Least squares circle fitting for compound radius measurements.
+
+Points are fed one at a time so large measurement files never have to be held as triangles,
+only the apex points of one section are kept. A fit starts with the algebraic (Kasa) solution
+and is then polished with a few Gauss-Newton steps on the true point-to-circle distances, which
+need every point again, as do the residuals and the spline through the sorted points.
+"""
+
+import math
+
+
+class CircleFitter:
+    """Keeps the points of one section and fits a circle through them."""
+
+    def __init__(self):
+        self.points = []
+
+    def add(self, x, y):
+        self.points.append((x, y))
+
+    def __len__(self):
+        return len(self.points)
+
+    def algebraicFit(self):
+        # Minimize sum (x^2 + y^2 + D x + E y + F)^2, the normal equations are a 3x3 system
+        n = len(self.points)
+        sx = sy = sxx = syy = sxy = sz = sxz = syz = 0.0
+        # Shift to the centroid to keep the sums well conditioned
+        mx = sum(p[0] for p in self.points) / n
+        my = sum(p[1] for p in self.points) / n
+        for px, py in self.points:
+            x = px - mx
+            y = py - my
+            z = x * x + y * y
+            sx += x
+            sy += y
+            sxx += x * x
+            syy += y * y
+            sxy += x * y
+            sz += z
+            sxz += x * z
+            syz += y * z
+        matrix = [[sxx, sxy, sx], [sxy, syy, sy], [sx, sy, n]]
+        rhs = [-sxz, -syz, -sz]
+        d, e, f = solve3(matrix, rhs)
+        cx = -d / 2
+        cy = -e / 2
+        radiusSquared = cx * cx + cy * cy - f
+        if radiusSquared <= 0:
+            raise ValueError('Points do not define a circle')
+        return cx + mx, cy + my, math.sqrt(radiusSquared)
+
+    def fit(self, iterations=20):
+        """Return (center x, center y, radius, rms residual, max residual)."""
+        if len(self.points) < 3:
+            raise ValueError('At least 3 points are needed to fit a circle')
+        cx, cy, radius = self.algebraicFit()
+
+        # Gauss-Newton on the geometric distances, the algebraic fit is biased for short arcs
+        for _ in range(iterations):
+            jtj = [[0.0] * 3 for _ in range(3)]
+            jtr = [0.0] * 3
+            for px, py in self.points:
+                dx = px - cx
+                dy = py - cy
+                distance = math.hypot(dx, dy)
+                if distance == 0:
+                    continue
+                residual = distance - radius
+                row = (-dx / distance, -dy / distance, -1.0)
+                for i in range(3):
+                    jtr[i] += row[i] * residual
+                    for j in range(3):
+                        jtj[i][j] += row[i] * row[j]
+            try:
+                step = solve3(jtj, [-value for value in jtr])
+            except ValueError:
+                break
+            cx += step[0]
+            cy += step[1]
+            radius += step[2]
+            if max(abs(value) for value in step) < 1e-12 * max(1.0, radius):
+                break
+
+        residuals = [abs(math.hypot(px - cx, py - cy) - radius) for px, py in self.points]
+        rms = math.sqrt(sum(r * r for r in residuals) / len(residuals))
+        return cx, cy, abs(radius), rms, max(residuals)
+
+    def sweep(self, cx, cy):
+        """Return (start angle, sweep angle) of the arc covering the points, counterclockwise."""
+        angles = [math.atan2(py - cy, px - cx) for px, py in self.points]
+        # Measure around the mean direction so arcs crossing +-180 degrees work
+        meanAngle = math.atan2(sum(math.sin(a) for a in angles), sum(math.cos(a) for a in angles))
+        relative = [math.remainder(a - meanAngle, 2 * math.pi) for a in angles]
+        return meanAngle + min(relative), max(relative) - min(relative)
+
+    def sortedPoints(self, cx, cy):
+        """Return the points in order around the circle, for drawing a spline through them."""
+        start, _ = self.sweep(cx, cy)
+        return sorted(self.points,
+                      key=lambda p: (math.atan2(p[1] - cy, p[0] - cx) - start) % (2 * math.pi))
+
+
+def solve3(matrix, rhs):
+    """Solve a 3x3 linear system with partial pivoting."""
+    m = [list(row) + [value] for row, value in zip(matrix, rhs)]
+    for col in range(3):
+        pivot = max(range(col, 3), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-15:
+            raise ValueError('Singular system, the points may be collinear')
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, 3):
+            factor = m[r][col] / m[col][col]
+            for c in range(col, 4):
+                m[r][c] -= factor * m[col][c]
+    solution = [0.0] * 3
+    for r in range(2, -1, -1):
+        solution[r] = (m[r][3] - sum(m[r][c] * solution[c] for c in range(r + 1, 3))) / m[r][r]
+    return solution
+
+
+def chainSections(rows):
+    """Group consecutive measurements that share a baseline into sections.
+
+    rows yields (a, b, c). Every triangle in a section shares side a as its baseline, so the
+    apexes are all in the same frame and together trace the curve. Yields (a, [(b, c), ...]).
+    """
+    baseline = None
+    section = []
+    for a, b, c in rows:
+        if baseline is not None and abs(a - baseline) > 1e-9:
+            yield baseline, section
+            section = []
+        baseline = a
+        section.append((b, c))
+    if section:
+        yield baseline, section
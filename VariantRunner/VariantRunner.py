@@ -0,0 +1,249 @@
+"""This file acts as the main module for this script."""
+
+import traceback
+import adsk.core
+import adsk.fusion
+import csv
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+
+# Initialize the global variables for the Application and UserInterface objects.
+app = adsk.core.Application.get()
+ui  = app.userInterface
+
+# What to export for every variant
+EXPORT_STEP = True
+# Sketches in the root component to save as DXF, by name
+EXPORT_DXF_SKETCHES = []
+# Create a cut list with the CutList script, it has to be installed next to this one
+EXPORT_CUT_LIST = True
+CUT_LIST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CutList')
+
+# Folder the variants are exported to, one sub folder per variant
+OUTPUT_FOLDER_NAME = 'variants'
+# Written last in each variant folder, a variant with a manifest is complete and is skipped next time
+MANIFEST_FILENAME = 'manifest.json'
+
+def get_table_file():
+    """Ask the user for the CSV table of variants."""
+    file_dialog = ui.createFileDialog()
+    file_dialog.isMultiSelectEnabled = False
+    file_dialog.title = 'Select Variant Table'
+    file_dialog.filter = 'CSV files (*.csv)|*.csv'
+    if file_dialog.showOpen() != adsk.core.DialogResults.DialogOK:
+        return None
+    return file_dialog.filename
+
+def read_variants(filepath):
+    """Read the variant table.
+
+    The first column names the variant, every other column is a user parameter and each cell
+    is the expression to give it, e.g. "36 in". Empty cells are None, see resolve_params.
+    """
+    variants = []
+    with open(filepath, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        param_names = [name.strip() for name in header[1:]]
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            params = {}
+            cells = row[1:] + [''] * (len(param_names) - len(row[1:]))
+            for name, expression in zip(param_names, cells):
+                params[name] = expression.strip() or None
+            variants.append({'name': row[0].strip(), 'params': params})
+    return variants
+
+def resolve_params(params, original):
+    """Fill empty cells with the expression the design started with.
+
+    Every variant then sets all of the table's parameters, so its outputs don't depend on
+    which variant ran before it and match its hash.
+    """
+    return {name: original[name] if expression is None else expression
+            for name, expression in params.items() if expression is not None or name in original}
+
+def normalize_expression(expression):
+    """Fusion reformats expressions, so compare them without whitespace."""
+    return re.sub(r'\s+', '', expression)
+
+def count_changes(current, params):
+    """Return how many parameters would change going from current to params."""
+    return sum(1 for name, expression in params.items()
+               if normalize_expression(current.get(name, '')) != normalize_expression(expression))
+
+def order_variants(variants, current):
+    """Order the variants so each one changes as few parameters as possible from the one before.
+
+    Greedy nearest neighbour, starting from whatever the design is set to now.
+    """
+    remaining = list(variants)
+    ordered = []
+    state = dict(current)
+    while remaining:
+        # Ties keep the table order so runs are repeatable
+        best = min(remaining, key=lambda variant: count_changes(state, variant['params']))
+        remaining.remove(best)
+        ordered.append(best)
+        state.update(best['params'])
+    return ordered
+
+def get_design_identity(design):
+    """Return the design's data file id and version, or its name for unsaved designs."""
+    document = design.parentDocument
+    data_file = document.dataFile if document else None
+    if data_file:
+        return data_file.id, data_file.versionNumber
+    return document.name if document else 'untitled', 0
+
+def variant_hash(design_id, design_version, variant):
+    """Hash everything that affects a variant's outputs."""
+    key = {
+        'design': design_id,
+        'version': design_version,
+        'params': sorted((name, normalize_expression(expression)) for name, expression in variant['params'].items()),
+        'exports': [EXPORT_STEP, sorted(EXPORT_DXF_SKETCHES), EXPORT_CUT_LIST]
+    }
+    return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+
+def safe_filename(name):
+    """Replace characters that aren't allowed in file names."""
+    return ''.join(char if char.isalnum() or char in ' -_.' else '_' for char in name).strip()
+
+def load_cut_list_module():
+    """Load the CutList script as a package so its helpers can be reused, or return None if it isn't installed."""
+    if 'CutList' in sys.modules:
+        return sys.modules['CutList']
+    main_file = os.path.join(CUT_LIST_DIR, 'CutList.py')
+    if not os.path.exists(main_file):
+        return None
+    spec = importlib.util.spec_from_file_location('CutList', main_file, submodule_search_locations=[CUT_LIST_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['CutList'] = module
+    spec.loader.exec_module(module)
+    return module
+
+def apply_parameters(design, params, current):
+    """Set the parameters that differ from current, recomputing once. Returns the number changed."""
+    user_params = design.userParameters
+    changed = 0
+    was_deferred = design.isComputeDeferred
+    design.isComputeDeferred = True
+    try:
+        for name, expression in params.items():
+            if normalize_expression(current.get(name, '')) == normalize_expression(expression):
+                continue
+            param = user_params.itemByName(name)
+            if not param:
+                raise ValueError(f'The design has no user parameter named "{name}"')
+            param.expression = expression
+            current[name] = expression
+            changed += 1
+    finally:
+        design.isComputeDeferred = was_deferred
+    return changed
+
+def export_variant(design, folder, cut_list):
+    """Export the configured outputs of the current design state into folder and return the file names."""
+    files = []
+    root_comp = design.rootComponent
+
+    if EXPORT_STEP:
+        filepath = os.path.join(folder, 'model.step')
+        export_manager = design.exportManager
+        export_manager.execute(export_manager.createSTEPExportOptions(filepath, root_comp))
+        files.append(os.path.basename(filepath))
+
+    for sketch_name in EXPORT_DXF_SKETCHES:
+        sketch = root_comp.sketches.itemByName(sketch_name)
+        if not sketch:
+            app.log(f'Variant export: sketch "{sketch_name}" not found')
+            continue
+        filepath = os.path.join(folder, f'{safe_filename(sketch_name)}.dxf')
+        sketch.saveAsDXF(filepath)
+        files.append(os.path.basename(filepath))
+
+    if cut_list:
+        cut_counts, cut_details = cut_list.collect_cuts(design, CUT_LIST_DIR)
+        files.extend(cut_list.write_cut_list(os.path.join(folder, 'cut_list'), cut_counts, cut_details))
+
+    return files
+
+def run(_context: str):
+    """This function is called by Fusion when the script is run."""
+
+    try:
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if not design:
+            ui.messageBox('No active design found.')
+            return
+
+        table_file = get_table_file()
+        if not table_file:
+            return
+        variants = read_variants(table_file)
+        if not variants:
+            ui.messageBox('The variant table has no rows.')
+            return
+
+        cut_list = None
+        if EXPORT_CUT_LIST:
+            cut_list = load_cut_list_module()
+            if not cut_list:
+                app.log(f'CutList script not found in {CUT_LIST_DIR}, cut lists are skipped.')
+
+        output_dir = os.path.join(os.path.dirname(table_file), OUTPUT_FOLDER_NAME)
+        design_id, design_version = get_design_identity(design)
+
+        # Remember the starting values so the design can be put back afterwards
+        original = {param.name: param.expression for param in design.userParameters}
+        current = dict(original)
+        for variant in variants:
+            variant['params'] = resolve_params(variant['params'], original)
+
+        # Only variants whose outputs don't exist yet need any work
+        pending = []
+        skipped = 0
+        for variant in variants:
+            variant['folder'] = os.path.join(output_dir, f'{safe_filename(variant["name"])}_{variant_hash(design_id, design_version, variant)[:12]}')
+            if os.path.exists(os.path.join(variant['folder'], MANIFEST_FILENAME)):
+                skipped += 1
+            else:
+                pending.append(variant)
+
+        progress_dialog = ui.createProgressDialog()
+        progress_dialog.isCancelButtonShown = True
+        progress_dialog.show('Exporting variants...', '%v of %m variants', 0, len(pending))
+
+        changes = 0
+        exported = 0
+        try:
+            for variant in order_variants(pending, current):
+                if progress_dialog.wasCancelled:
+                    break
+                changes += apply_parameters(design, variant['params'], current)
+                adsk.doEvents()
+
+                os.makedirs(variant['folder'], exist_ok=True)
+                files = export_variant(design, variant['folder'], cut_list)
+                with open(os.path.join(variant['folder'], MANIFEST_FILENAME), 'w') as manifest:
+                    json.dump({'variant': variant['name'], 'params': variant['params'], 'design': design_id,
+                               'version': design_version, 'files': files}, manifest, indent=1)
+                exported += 1
+                progress_dialog.progressValue = exported
+        finally:
+            progress_dialog.hide()
+            apply_parameters(design, original, current)
+
+        ui.messageBox(f'Exported {exported} variants with {changes} parameter changes, '
+                      f'{skipped} were already up to date.\nSaved in: {output_dir}')
+
+    except:  #pylint:disable=bare-except
+        # Write the error message to the TEXT COMMANDS window.
+        app.log(f'Failed:\n{traceback.format_exc()}')
+        ui.messageBox('Failed to export variants. Check the TEXT COMMANDS window for details.')